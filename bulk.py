@@ -0,0 +1,215 @@
+# Copyright (c) 2021-2025 r3w0p
+# The following code can be redistributed and/or
+# modified under the terms of the GPL-3.0 License.
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from time import perf_counter
+
+from src.constants import EMOJI_STYLES_ALL, EMOJI_STYLE_APPLE, \
+    COMMAND_DARK, RESAMPLE_ALL, IMAGE_RESAMPLE_DOWN, IMAGE_RESAMPLE_UP, \
+    SUPPORTED_FILE_TYPES, FILE_TYPE_JPEG
+from src.exceptions import MinorMemeoffError
+from src.functions import get_formats, get_emoji_source, \
+    image_ftype_from_bytes
+from src.render import render_bytes
+
+parser = argparse.ArgumentParser(description="Renders memes from a JSONL manifest of {image, command, emoji, dark} jobs, without Discord.")
+parser.add_argument("manifest", type=str, help="JSONL manifest; image paths are relative to it.")
+parser.add_argument("-o", "--output", type=str, required=True, help="Directory to write rendered images to.")
+parser.add_argument("-e", "--emoji", type=str, default=EMOJI_STYLE_APPLE, choices=EMOJI_STYLES_ALL, help="Emoji style for jobs that do not give one.")
+parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="Number of render processes.")
+parser.add_argument("--resample_down", type=str, default=IMAGE_RESAMPLE_DOWN, choices=RESAMPLE_ALL, help="Filter used when shrinking images.")
+parser.add_argument("--resample_up", type=str, default=IMAGE_RESAMPLE_UP, choices=RESAMPLE_ALL, help="Filter used when enlarging images.")
+parser.add_argument("--max_bytes", type=int, default=0, help="Largest output, re-encoding larger ones to fit (0 for no limit).")
+parser.add_argument("--force", action="store_true", help="Render jobs that already have an output.")
+
+# Jobs submitted per worker ahead of those running, so that the manifest is
+# read as the run goes
+_BACKLOG_PER_WORKER = 4
+_PROGRESS_EVERY = 100
+
+# Per-process state, set once by the initializer
+_formats = None
+_emoji_sources = {}
+
+
+def _init_worker() -> None:
+    global _formats
+
+    _formats = get_formats()
+
+
+def render_job(
+        line: str,
+        name: str,
+        path_manifest: Path,
+        path_output: Path,
+        options: dict
+):
+    """Renders the job on one manifest `line` to `path_output`, returning
+    its input and output sizes in bytes."""
+    try:
+        job = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise MinorMemeoffError(f"Malformed job: {e}")
+
+    if not isinstance(job, dict):
+        raise MinorMemeoffError("Malformed job: not a JSON object")
+
+    style = job.get("emoji", options["emoji"])
+
+    if style not in _emoji_sources:
+        _emoji_sources[style] = get_emoji_source(style)
+
+    content = job["command"]
+
+    if job.get("dark", False) and COMMAND_DARK not in content:
+        content = f"{content} {COMMAND_DARK}"
+
+    path_image = path_manifest.parent / job["image"]
+    image_bytes = path_image.read_bytes()
+    image_ftype = image_ftype_from_bytes(image_bytes)
+
+    if image_ftype not in SUPPORTED_FILE_TYPES:
+        raise MinorMemeoffError(
+            f"Image file type is not supported: {path_image}")
+
+    output, output_ftype = render_bytes(
+        image_bytes,
+        path_image,
+        image_ftype,
+        content,
+        options["resample_down"],
+        options["resample_up"],
+        options["max_bytes"],
+        _formats,
+        _emoji_sources[style]
+    )
+
+    # Written whole and then renamed, so an output that exists is complete
+    path_file = path_output / f"{name}.{_extension(output_ftype)}"
+    path_tmp = path_output / f"{name}.{os.getpid()}.tmp"
+    path_tmp.write_bytes(output)
+    os.replace(path_tmp, path_file)
+
+    return len(image_bytes), len(output)
+
+
+def read_jobs(path_manifest: Path, done: set):
+    # Jobs are named by their line number in the manifest, and parsed when
+    # rendered so that a malformed line fails only its own job
+    with open(path_manifest, encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            name = f"{number:08d}"
+
+            if len(line.strip()) == 0 or name in done:
+                continue
+
+            yield name, line.strip()
+
+
+def find_done(path_output: Path) -> set:
+    done = set()
+
+    for path_file in path_output.iterdir():
+        if path_file.suffix == ".tmp":
+            path_file.unlink()  # left by an interrupted run
+        else:
+            done.add(path_file.stem)
+
+    return done
+
+
+def _extension(ftype: str) -> str:
+    return "jpg" if ftype == FILE_TYPE_JPEG else ftype.lower()
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    path_manifest = Path(args.manifest).absolute()
+    path_output = Path(args.output).absolute()
+    path_output.mkdir(parents=True, exist_ok=True)
+
+    done = set() if args.force else find_done(path_output)
+    options = {
+        "emoji": args.emoji,
+        "resample_down": args.resample_down,
+        "resample_up": args.resample_up,
+        "max_bytes": args.max_bytes
+    }
+
+    rendered = failed = bytes_in = bytes_out = 0
+    time_start = perf_counter()
+
+    if len(done) > 0:
+        print(f"Skipping {len(done)} jobs already rendered")
+
+    with ProcessPoolExecutor(
+            max_workers=args.workers,
+            initializer=_init_worker
+    ) as executor:
+        jobs = read_jobs(path_manifest, done)
+        pending = {}
+
+        try:
+            while True:
+                for name, line in jobs:
+                    future = executor.submit(
+                        render_job,
+                        line,
+                        name,
+                        path_manifest,
+                        path_output,
+                        options
+                    )
+                    pending[future] = name
+
+                    if len(pending) >= args.workers * _BACKLOG_PER_WORKER:
+                        break
+
+                if len(pending) == 0:
+                    break
+
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+                for future in finished:
+                    name = pending.pop(future)
+
+                    try:
+                        size_in, size_out = future.result()
+                    except Exception as e:
+                        failed += 1
+                        print(f"{name}: {e}", file=sys.stderr)
+                        continue
+
+                    rendered += 1
+                    bytes_in += size_in
+                    bytes_out += size_out
+
+                    if rendered % _PROGRESS_EVERY == 0:
+                        print(
+                            f"{rendered} rendered, "
+                            f"{rendered / (perf_counter() - time_start):.1f}"
+                            f" jobs/s")
+
+        except KeyboardInterrupt:
+            # Outputs already written are kept, and skipped when resumed
+            for future in pending:
+                future.cancel()
+
+            print("Interrupted; run again to resume", file=sys.stderr)
+
+    elapsed = perf_counter() - time_start
+
+    print(
+        f"{rendered} rendered, {failed} failed in {elapsed:.1f}s "
+        f"({rendered / elapsed:.1f} jobs/s, "
+        f"{bytes_in / elapsed / 1e6:.1f} MB/s in, "
+        f"{bytes_out / elapsed / 1e6:.1f} MB/s out)"
+    )
@@ -0,0 +1,110 @@
+# Copyright (c) 2021-2025 r3w0p
+# The following code can be redistributed and/or
+# modified under the terms of the GPL-3.0 License.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from time import sleep
+from urllib.request import Request, urlopen
+
+from src.constants import ENV_TOKEN, SHARD_RESTART_DELAY, \
+    DISCORD_URL_GATEWAY_BOT, MEMEOFF_VERSION, MEMEOFF_URL_GITHUB
+
+PATH_MAIN: Path = Path(__file__).parent.absolute() / "main.py"
+
+parser = argparse.ArgumentParser(description="Runs the bot as several processes, each with its own range of shards. Other arguments are passed to main.py.")
+parser.add_argument("-p", "--processes", type=int, required=True, help="Number of processes to run.")
+parser.add_argument("-t", "--token", type=str, default=os.environ.get(ENV_TOKEN), required=ENV_TOKEN not in os.environ, help=f"Discord token (default: ${ENV_TOKEN}).")
+parser.add_argument("--shard_count", type=int, help="Total number of shards (default: as recommended by Discord).")
+parser.add_argument("--metrics_port", type=int, help="Metrics port of the first process, incremented for each after it (optional).")
+parser.add_argument("--render_cache_dir", type=str, help="Directory under which each process keeps its own render cache (optional).")
+
+
+def recommended_shard_count(token: str) -> int:
+    request = Request(DISCORD_URL_GATEWAY_BOT, headers={
+        "Authorization": f"Bot {token}",
+        "User-Agent": f"DiscordBot ({MEMEOFF_URL_GITHUB}, {MEMEOFF_VERSION})"
+    })
+
+    with urlopen(request) as response:
+        return json.load(response)["shards"]
+
+
+def shard_ranges(shard_count: int, processes: int):
+    # Contiguous ranges, as even as possible
+    per, extra = divmod(shard_count, processes)
+    start = 0
+
+    for i in range(processes):
+        end = start + per + (1 if i < extra else 0)
+        yield list(range(start, end))
+        start = end
+
+
+def process_command(i: int, shard_ids, shard_count: int, args, rest):
+    command = [
+        sys.executable, str(PATH_MAIN), *rest,
+        "--shard_count", str(shard_count),
+        "--shard_ids", *[str(shard_id) for shard_id in shard_ids]
+    ]
+
+    if args.metrics_port is not None:
+        command += ["--metrics_port", str(args.metrics_port + i)]
+
+    if args.render_cache_dir is not None:
+        command += [
+            "--render_cache_dir",
+            str(Path(args.render_cache_dir) / f"process-{i}")
+        ]
+
+    return command
+
+
+if __name__ == "__main__":
+    args, rest = parser.parse_known_args()
+
+    shard_count = args.shard_count
+
+    if shard_count is None:
+        shard_count = recommended_shard_count(args.token)
+
+    processes = min(args.processes, shard_count)
+    ranges = list(shard_ranges(shard_count, processes))
+
+    # Token is passed in the environment, not where other users can see it
+    env = {**os.environ, ENV_TOKEN: args.token}
+    commands = [
+        process_command(i, shard_ids, shard_count, args, rest)
+        for i, shard_ids in enumerate(ranges)
+    ]
+    running = {}
+
+    print(f"Running {shard_count} shards in {processes} processes")
+
+    try:
+        while True:
+            for i, command in enumerate(commands):
+                if i not in running:
+                    print(f"Starting process {i} with shards {ranges[i]}")
+                    running[i] = subprocess.Popen(command, env=env)
+
+            sleep(SHARD_RESTART_DELAY)
+
+            # Restart any process that has exited, after the delay above
+            for i, process in list(running.items()):
+                code = process.poll()
+
+                if code is not None:
+                    print(f"Process {i} exited with code {code}")
+                    del running[i]
+
+    except KeyboardInterrupt:
+        for process in running.values():
+            process.terminate()
+
+        for process in running.values():
+            process.wait()
@@ -3,15 +3,47 @@
 # modified under the terms of the GPL-3.0 License.
 
 import argparse
+import os
 from src.client import get_client
-from src.constants import EMOJI_STYLES_ALL, EMOJI_STYLE_APPLE
+from src.constants import EMOJI_STYLES_ALL, EMOJI_STYLE_APPLE, \
+    RENDER_MODES_ALL, RENDER_MODE_INLINE, RENDER_WORKERS_DEFAULT, \
+    RENDER_RECYCLE_DEFAULT, RESAMPLE_ALL, IMAGE_RESAMPLE_DOWN, \
+    IMAGE_RESAMPLE_UP, RENDER_CACHE_MEMORY_MAX_BYTES, ENCODE_MAX_BYTES, \
+    SCHEDULER_MAX_ACTIVE, SCHEDULER_MAX_QUEUED, SCHEDULER_GUILD_MAX_ACTIVE, \
+    SCHEDULER_USER_MAX_PENDING, METRICS_HOST_DEFAULT, SHARD_REPORT_INTERVAL, \
+    ENV_TOKEN, LANE_SLOW_SECONDS, LANE_SLOW_MAX_ACTIVE
 
 parser = argparse.ArgumentParser()
 parser.add_argument("-e", "--emoji", type=str, default=EMOJI_STYLE_APPLE, help=f"Emoji style to use ({', '.join(EMOJI_STYLES_ALL)}).")
 parser.add_argument("-g", "--guild", type=str, help="Discord guild ID for slash commands.")
-parser.add_argument("-t", "--token", type=str, required=True, help="Discord token.")
+parser.add_argument("-t", "--token", type=str, default=os.environ.get(ENV_TOKEN), required=ENV_TOKEN not in os.environ, help=f"Discord token (default: ${ENV_TOKEN}).")
 parser.add_argument("--disable_anon", action="store_true", help="Disables anonymity on all messages.")
 parser.add_argument("--force_anon", action="store_true", help="Forces anonymity on all messages.")
+parser.add_argument("--disable_emoji_cache", action="store_true", help="Disables the emoji image cache.")
+parser.add_argument("--render_mode", type=str, default=RENDER_MODE_INLINE, choices=RENDER_MODES_ALL, help=f"Where to render images ({', '.join(RENDER_MODES_ALL)}).")
+parser.add_argument("--render_workers", type=int, default=RENDER_WORKERS_DEFAULT, help="Number of render workers in thread or process mode.")
+parser.add_argument("--render_recycle", type=int, default=RENDER_RECYCLE_DEFAULT, help="Replace render workers after this many jobs (0 to disable).")
+parser.add_argument("--resample_down", type=str, default=IMAGE_RESAMPLE_DOWN, choices=RESAMPLE_ALL, help="Filter used when shrinking images.")
+parser.add_argument("--resample_up", type=str, default=IMAGE_RESAMPLE_UP, choices=RESAMPLE_ALL, help="Filter used when enlarging images.")
+parser.add_argument("--render_cache_memory", type=int, default=RENDER_CACHE_MEMORY_MAX_BYTES, help="Bytes of rendered images to keep in memory (0 to disable).")
+parser.add_argument("--render_cache_dir", type=str, help="Directory to spill rendered images evicted from memory to (optional).")
+parser.add_argument("--max_upload_bytes", type=int, default=ENCODE_MAX_BYTES, help="Largest image to send, re-encoding larger ones to fit (0 for no limit).")
+parser.add_argument("--max_active_renders", type=int, default=SCHEDULER_MAX_ACTIVE, help="Renders to run at once.")
+parser.add_argument("--max_queued_renders", type=int, default=SCHEDULER_MAX_QUEUED, help="Renders to queue before rejecting new ones.")
+parser.add_argument("--guild_max_active_renders", type=int, default=SCHEDULER_GUILD_MAX_ACTIVE, help="Renders each guild may run at once.")
+parser.add_argument("--user_max_pending_renders", type=int, default=SCHEDULER_USER_MAX_PENDING, help="Renders each user may have running or queued.")
+parser.add_argument("--slow_lane_seconds", type=float, default=LANE_SLOW_SECONDS, help="Predicted render seconds above which renders run in a separate slow lane, in thread or process mode (0 to disable).")
+parser.add_argument("--slow_lane_renders", type=int, default=LANE_SLOW_MAX_ACTIVE, help="Renders to run at once in the slow lane.")
+parser.add_argument("--metrics_port", type=int, help="Port to serve Prometheus metrics on (optional).")
+parser.add_argument("--metrics_host", type=str, default=METRICS_HOST_DEFAULT, help="Address to serve Prometheus metrics on.")
+parser.add_argument("--autoshard", action="store_true", help="Runs the shards Discord recommends in this process.")
+parser.add_argument("--shard_count", type=int, help="Total number of shards across all processes (enables sharding).")
+parser.add_argument("--shard_ids", type=int, nargs="+", help="Shards to run in this process (default: all).")
+parser.add_argument("--shard_report_interval", type=float, default=SHARD_REPORT_INTERVAL, help="Seconds between shard latency reports (0 to disable).")
+parser.add_argument("--lean", action="store_true", help="Requests only the intents needed and caches no members and few messages.")
+parser.add_argument("--max_messages", type=int, help="Messages to cache (0 to disable; default: 100 if lean, else 1000).")
+parser.add_argument("--disable_prewarm", action="store_true", help="Skips warming up fonts and renders before connecting.")
+parser.add_argument("--prewarm_emoji", action="store_true", help="Also fetches common emoji into the emoji cache when warming up.")
 args = parser.parse_args()
 
 
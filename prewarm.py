@@ -0,0 +1,49 @@
+# Copyright (c) 2021-2025 r3w0p
+# The following code can be redistributed and/or
+# modified under the terms of the GPL-3.0 License.
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from emoji import EMOJI_UNICODE
+from pilmoji.helpers import EMOJI_REGEX
+
+from src.constants import EMOJI_STYLES_ALL
+from src.functions import get_emoji_source, remove_variant_selectors
+
+parser = argparse.ArgumentParser(description="Fills the emoji image cache ahead of time.")
+parser.add_argument("-e", "--emoji", type=str, nargs="+", default=EMOJI_STYLES_ALL, choices=EMOJI_STYLES_ALL, help="Emoji styles to prewarm.")
+parser.add_argument("-w", "--workers", type=int, default=8, help="Number of concurrent downloads.")
+args = parser.parse_args()
+
+
+def emoji_to_prewarm():
+    # Emoji as pilmoji will see them once variant selectors are removed
+    found = set()
+
+    for e in EMOJI_UNICODE["en"].values():
+        found.update(EMOJI_REGEX.findall(remove_variant_selectors(e)))
+
+    return sorted(found)
+
+
+if __name__ == "__main__":
+    emoji_all = emoji_to_prewarm()
+
+    for style in args.emoji:
+        emoji_source = get_emoji_source(style)
+        time_start = perf_counter()
+
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            list(executor.map(emoji_source.get_emoji, emoji_all))
+
+        stats = emoji_source.stats()
+        print(
+            f"{style}: {len(emoji_all)} emoji in "
+            f"{perf_counter() - time_start:.1f}s "
+            f"(memory hits {stats['hits_memory']}, "
+            f"disk hits {stats['hits_disk']}, "
+            f"misses {stats['misses']}, "
+            f"{stats['disk_bytes']} bytes on disk)"
+        )
@@ -0,0 +1,40 @@
+# Copyright (c) 2021-2025 r3w0p
+# The following code can be redistributed and/or
+# modified under the terms of the GPL-3.0 License.
+
+import argparse
+from aiohttp import web
+from src.service import get_service
+from src.constants import EMOJI_STYLES_ALL, EMOJI_STYLE_APPLE, \
+    RENDER_MODES_ALL, RENDER_MODE_THREAD, RENDER_WORKERS_DEFAULT, \
+    RENDER_RECYCLE_DEFAULT, RESAMPLE_ALL, IMAGE_RESAMPLE_DOWN, \
+    IMAGE_RESAMPLE_UP, DOWNLOAD_MAX_BYTES, SCHEDULER_MAX_ACTIVE, \
+    SCHEDULER_MAX_QUEUED, SCHEDULER_GUILD_MAX_ACTIVE, \
+    SCHEDULER_USER_MAX_PENDING, SERVICE_HOST_DEFAULT, SERVICE_PORT_DEFAULT, \
+    LANE_SLOW_SECONDS, LANE_SLOW_MAX_ACTIVE
+
+parser = argparse.ArgumentParser(description="Serves the meme renderer over HTTP, without Discord.")
+parser.add_argument("-e", "--emoji", type=str, default=EMOJI_STYLE_APPLE, help=f"Emoji style to use ({', '.join(EMOJI_STYLES_ALL)}).")
+parser.add_argument("--host", type=str, default=SERVICE_HOST_DEFAULT, help="Address to listen on.")
+parser.add_argument("--port", type=int, default=SERVICE_PORT_DEFAULT, help="Port to listen on.")
+parser.add_argument("--disable_emoji_cache", action="store_true", help="Disables the emoji image cache.")
+parser.add_argument("--render_mode", type=str, default=RENDER_MODE_THREAD, choices=RENDER_MODES_ALL, help=f"Where to render images ({', '.join(RENDER_MODES_ALL)}).")
+parser.add_argument("--render_workers", type=int, default=RENDER_WORKERS_DEFAULT, help="Number of render workers in thread or process mode.")
+parser.add_argument("--render_recycle", type=int, default=RENDER_RECYCLE_DEFAULT, help="Replace render workers after this many jobs (0 to disable).")
+parser.add_argument("--resample_down", type=str, default=IMAGE_RESAMPLE_DOWN, choices=RESAMPLE_ALL, help="Filter used when shrinking images.")
+parser.add_argument("--resample_up", type=str, default=IMAGE_RESAMPLE_UP, choices=RESAMPLE_ALL, help="Filter used when enlarging images.")
+parser.add_argument("--max_request_bytes", type=int, default=DOWNLOAD_MAX_BYTES, help="Largest image to accept.")
+parser.add_argument("--max_upload_bytes", type=int, default=0, help="Largest image to return, re-encoding larger ones to fit (0 for no limit).")
+parser.add_argument("--max_active_renders", type=int, default=SCHEDULER_MAX_ACTIVE, help="Renders to run at once.")
+parser.add_argument("--max_queued_renders", type=int, default=SCHEDULER_MAX_QUEUED, help="Renders to queue before rejecting new ones.")
+parser.add_argument("--client_max_active_renders", type=int, default=SCHEDULER_GUILD_MAX_ACTIVE, help="Renders each client address may run at once.")
+parser.add_argument("--client_max_pending_renders", type=int, default=SCHEDULER_MAX_QUEUED, help="Renders each client address may have running or queued.")
+parser.add_argument("--slow_lane_seconds", type=float, default=LANE_SLOW_SECONDS, help="Predicted render seconds above which renders run in a separate slow lane, in thread or process mode (0 to disable).")
+parser.add_argument("--slow_lane_renders", type=int, default=LANE_SLOW_MAX_ACTIVE, help="Renders to run at once in the slow lane.")
+parser.add_argument("--disable_prewarm", action="store_true", help="Skips warming up fonts and renders before listening.")
+parser.add_argument("--prewarm_emoji", action="store_true", help="Also fetches common emoji into the emoji cache when warming up.")
+args = parser.parse_args()
+
+
+if __name__ == "__main__":
+    web.run_app(get_service(args), host=args.host, port=args.port)
@@ -0,0 +1,165 @@
+# Copyright (c) 2021-2025 r3w0p
+# The following code can be redistributed and/or
+# modified under the terms of the GPL-3.0 License.
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import List, Optional, Tuple
+
+from PIL import Image, ImageChops, ImageSequence
+
+from src.constants import *
+from src.exceptions import MinorMemeoffError
+from src.functions import process_content, reshape_image
+from src.stages import stage
+
+# Pillow releases the GIL while resampling, compositing and quantising, so
+# per-frame work is spread over threads. Created lazily so that forked
+# render workers each get their own.
+_frame_pool: Optional[ThreadPoolExecutor] = None
+_frame_workers: int = os.cpu_count() or 1
+
+
+def _get_frame_pool() -> ThreadPoolExecutor:
+    global _frame_pool
+
+    if _frame_pool is None:
+        _frame_pool = ThreadPoolExecutor(
+            max_workers=_frame_workers,
+            thread_name_prefix=f"{NAME_MEMEOFF}-frames"
+        )
+
+    return _frame_pool
+
+
+def is_animated(image) -> bool:
+    return getattr(image, "n_frames", 1) > 1
+
+
+def process_animation(
+        image,
+        content: str,
+        formats,
+        emoji_source,
+        image_ftype: str,
+        resample_down: str = IMAGE_RESAMPLE_DOWN,
+        resample_up: str = IMAGE_RESAMPLE_UP
+) -> bytes:
+    """Applies the formats in `content` to every frame of an animation and
+    returns it encoded as `image_ftype`.
+
+    The formats are rendered once, into an overlay that is composited
+    onto each frame.
+    """
+    if image.n_frames > ANIMATION_MAX_FRAMES:
+        raise MinorMemeoffError(
+            f"Animation has more than {ANIMATION_MAX_FRAMES} frames.")
+
+    pool = _get_frame_pool()
+    loop = image.info.get("loop", 0)
+
+    with stage(STAGE_FRAMES):
+        # Frames decode in order, as each may build on the previous one, and
+        # are reshaped as they go, so that only a few are held at full size
+        frames = []
+        durations = []
+        reshaping = deque()
+
+        for frame in ImageSequence.Iterator(image):
+            reshaping.append(pool.submit(
+                reshape_image,
+                frame.convert("RGBA"),
+                resample_down=resample_down,
+                resample_up=resample_up
+            ))
+            durations.append(
+                frame.info.get("duration", ANIMATION_DURATION_DEFAULT))
+
+            if len(reshaping) > _frame_workers:
+                frames.append(reshaping.popleft().result())
+
+        frames += [future.result() for future in reshaping]
+
+    with stage(STAGE_OVERLAY):
+        overlay, xy = _render_overlay(
+            frames[0].size, content, formats, emoji_source)
+
+    with stage(STAGE_COMPOSITE):
+        frames = list(pool.map(
+            lambda f: _composite(f, overlay, xy), frames))
+
+    with stage(STAGE_ENCODE):
+        return _encode_animation(frames, durations, loop, image_ftype)
+
+
+def _render_overlay(
+        size: Tuple[int, int],
+        content: str,
+        formats,
+        emoji_source
+) -> Tuple[Image.Image, Tuple[int, int]]:
+    # Renders onto a transparent stand-in for a frame. Formats only blend
+    # borders and text over the frame, so what they leave transparent shows
+    # the frame through it.
+    overlay = process_content(
+        image=Image.new("RGBA", size, (0, 0, 0, 0)),
+        content=content,
+        formats=formats,
+        emoji_source=emoji_source
+    )
+
+    if overlay.mode != "RGBA":
+        raise MinorMemeoffError("Cannot apply these formats to animations.")
+
+    # The frame sits where anything shows through
+    box = ImageChops.invert(overlay.getchannel("A")).getbbox()
+
+    if box is None or (box[2] - box[0], box[3] - box[1]) != size:
+        raise MinorMemeoffError("Cannot apply these formats to animations.")
+
+    return overlay, box[:2]
+
+
+def _composite(frame, overlay, xy):
+    canvas = Image.new("RGBA", overlay.size)
+    canvas.paste(frame, xy)
+
+    return Image.alpha_composite(canvas, overlay)
+
+
+def _encode_animation(
+        frames: List[Image.Image],
+        durations: List[int],
+        loop: int,
+        image_ftype: str
+) -> bytes:
+    if image_ftype == FILE_TYPE_GIF:
+        # One palette, taken from a few frames spread across the animation,
+        # is reused for every frame rather than computing one per frame
+        samples = frames[::max(1, len(frames) // ANIMATION_PALETTE_SAMPLES)]
+        samples = samples[:ANIMATION_PALETTE_SAMPLES]
+        montage = Image.new(
+            "RGB", (frames[0].size[0], frames[0].size[1] * len(samples)))
+
+        for i, sample in enumerate(samples):
+            montage.paste(sample.convert("RGB"), (0, i * sample.size[1]))
+
+        palette = montage.quantize(colors=256)
+
+        frames = list(_get_frame_pool().map(
+            lambda f: f.convert("RGB").quantize(palette=palette),
+            frames
+        ))
+
+    with BytesIO() as image_binary:
+        frames[0].save(
+            image_binary,
+            image_ftype,
+            save_all=True,
+            append_images=frames[1:],
+            duration=durations,
+            loop=loop
+        )
+
+        return image_binary.getvalue()
@@ -0,0 +1,201 @@
+# Copyright (c) 2021-2025 r3w0p
+# The following code can be redistributed and/or
+# modified under the terms of the GPL-3.0 License.
+import os
+from collections import OrderedDict
+from hashlib import sha1
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Optional
+
+
+class ByteCache:
+    """A two-tier least-recently-used cache of bytes.
+
+    Entries are kept in memory up to `memory_max_bytes`. If `path` is given,
+    entries are also kept on disk up to `disk_max_bytes`, either as soon as
+    they are added (`write_through`) or when they are evicted from memory.
+    Empty values are cached in memory only.
+    """
+
+    def __init__(
+            self,
+            memory_max_bytes: int,
+            path: Optional[Path] = None,
+            disk_max_bytes: int = 0,
+            write_through: bool = True
+    ) -> None:
+        self._memory_max_bytes = memory_max_bytes
+        self._path = path
+        self._disk_max_bytes = disk_max_bytes
+        self._write_through = write_through
+
+        self._memory: OrderedDict = OrderedDict()
+        self._memory_bytes: int = 0
+        self._disk_bytes: int = 0
+        self._lock = Lock()
+
+        self.hits_memory: int = 0
+        self.hits_disk: int = 0
+        self.misses: int = 0
+
+        if self._path is not None:
+            self._path.mkdir(parents=True, exist_ok=True)
+            self._disk_bytes = sum(
+                f.stat().st_size for f in self._path.iterdir() if f.is_file()
+            )
+
+    def __getstate__(self) -> dict:
+        # Copies in other processes start with an empty memory tier but
+        # share the disk tier
+        return {
+            "memory_max_bytes": self._memory_max_bytes,
+            "path": self._path,
+            "disk_max_bytes": self._disk_max_bytes,
+            "write_through": self._write_through
+        }
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(**state)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._memory.get(key)
+
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+                return data
+
+        data = self._disk_read(key)
+
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+
+            self.hits_disk += 1
+            evicted = self._memory_put(key, data)
+
+        self._spill(evicted)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        with self._lock:
+            evicted = self._memory_put(key, data)
+
+        if self._write_through:
+            self._disk_write(key, data)
+
+        self._spill(evicted)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits_memory + self.hits_disk + self.misses
+
+            return {
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "hit_rate": (
+                    (self.hits_memory + self.hits_disk) / lookups
+                    if lookups > 0 else 0.0
+                ),
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_bytes": self._disk_bytes
+            }
+
+    def _memory_put(self, key: str, data: bytes):
+        evicted = []
+
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+
+        if len(data) > self._memory_max_bytes:
+            return [(key, data)]
+
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+
+        while self._memory_bytes > self._memory_max_bytes:
+            evicted.append(self._memory.popitem(last=False))
+            self._memory_bytes -= len(evicted[-1][1])
+
+        return evicted
+
+    def _spill(self, evicted) -> None:
+        if self._write_through:
+            return
+
+        for key, data in evicted:
+            self._disk_write(key, data)
+
+    def _disk_file(self, key: str) -> Path:
+        return self._path / sha1(key.encode("utf-8")).hexdigest()
+
+    def _disk_read(self, key: str) -> Optional[bytes]:
+        if self._path is None:
+            return None
+
+        path_file = self._disk_file(key)
+
+        try:
+            data = path_file.read_bytes()
+        except OSError:
+            return None
+
+        # Refresh modification time so that eviction is least-recently-used
+        try:
+            os.utime(path_file)
+        except OSError:
+            pass
+
+        return data
+
+    def _disk_write(self, key: str, data: bytes) -> None:
+        if (
+                self._path is None or
+                len(data) == 0 or
+                len(data) > self._disk_max_bytes
+        ):
+            return
+
+        path_file = self._disk_file(key)
+        path_tmp = path_file.with_suffix(f".{os.getpid()}.tmp")
+
+        # A file the key already has is replaced, and no longer counted
+        try:
+            size_replaced = path_file.stat().st_size
+        except OSError:
+            size_replaced = 0
+
+        try:
+            path_tmp.write_bytes(data)
+            os.replace(path_tmp, path_file)
+        except OSError:
+            return
+
+        with self._lock:
+            self._disk_bytes += len(data) - size_replaced
+
+            if self._disk_bytes > self._disk_max_bytes:
+                self._disk_evict()
+
+    def _disk_evict(self) -> None:
+        files = sorted(
+            (f for f in self._path.iterdir() if f.is_file()),
+            key=lambda f: f.stat().st_mtime
+        )
+        self._disk_bytes = sum(f.stat().st_size for f in files)
+
+        for f in files:
+            if self._disk_bytes <= self._disk_max_bytes:
+                break
+
+            try:
+                size = f.stat().st_size
+                f.unlink()
+                self._disk_bytes -= size
+            except OSError:
+                pass
@@ -2,6 +2,7 @@
 # The following code can be redistributed and/or
 # modified under the terms of the GPL-3.0 License.
 import asyncio
+import resource
 from io import BytesIO
 from time import time_ns
 from typing import Optional
@@ -10,14 +11,197 @@ import discord
 from discord.app_commands import CommandTree
 
 from src.functions import *
+from src.cache import ByteCache
+from src.metrics import MetricsRegistry, get_bot_metrics, \
+    record_stage_metrics, start_metrics_server
+from src.cost import render_features
+from src.lanes import get_render_lanes
+from src.render import render_cache_key, render_flight_key
+from src.shards import ShardMonitor
+from src.singleflight import SingleFlight
+from src.stages import add_stage_recorder, stage
+from src.warmup import print_warm_up, warm_glyph_tables, warm_up
+
+
+def get_intents(lean: bool) -> discord.Intents:
+    if not lean:
+        return discord.Intents.all()
+
+    # Only what is needed to read messages and their attachments
+    intents = discord.Intents.none()
+    intents.guilds = True
+    intents.guild_messages = True
+    intents.dm_messages = True
+    intents.message_content = True
+
+    return intents
 
 
 def get_client(args) -> discord.Client:
-    intents = discord.Intents.all()
-    client = discord.Client(intents=intents)
+    intents = get_intents(args.lean)
+    options = {}
+
+    if args.lean:
+        options = {
+            "member_cache_flags": discord.MemberCacheFlags.none(),
+            "max_messages": CLIENT_LEAN_MAX_MESSAGES,
+            "chunk_guilds_at_startup": False
+        }
+
+    if args.max_messages is not None:
+        options["max_messages"] = args.max_messages or None
+
+    if args.shard_ids is not None and args.shard_count is None:
+        raise MajorMemeoffError("Shard IDs require a shard count.")
+
+    if args.autoshard or args.shard_count is not None:
+        # Shard count is fetched from Discord if not given
+        client = discord.AutoShardedClient(
+            intents=intents,
+            shard_count=args.shard_count,
+            shard_ids=args.shard_ids,
+            **options
+        )
+    else:
+        client = discord.Client(intents=intents, **options)
+
+    shard_monitor = ShardMonitor(client)
+    shard_report = None
+
+    # Set once warmed up and connected
+    ready = asyncio.Event()
     formats: Dict[str, MemeFormat] = get_formats()
     tree: Optional[CommandTree] = None
-    emoji_source = emoji_style_to_pilmoji_source_class(args.emoji)
+    emoji_source = get_emoji_source(
+        args.emoji, cache=not args.disable_emoji_cache)
+    render_lanes = get_render_lanes(
+        args,
+        formats,
+        emoji_source,
+        guild_max_active=args.guild_max_active_renders,
+        user_max_pending=args.user_max_pending_renders
+    )
+    render_flights = SingleFlight()
+    render_cache: Optional[ByteCache] = None
+
+    if args.render_cache_memory > 0 or args.render_cache_dir is not None:
+        render_cache = ByteCache(
+            memory_max_bytes=args.render_cache_memory,
+            path=(
+                Path(args.render_cache_dir)
+                if args.render_cache_dir is not None else None
+            ),
+            disk_max_bytes=RENDER_CACHE_DISK_MAX_BYTES,
+            write_through=False
+        )
+
+    metrics: Optional[MetricsRegistry] = None
+    metrics_runner = None
+
+    if args.metrics_port is not None:
+        metrics = get_bot_metrics()
+        metrics.gauge(
+            METRIC_QUEUE_ACTIVE,
+            "Renders running, by lane.",
+            lambda: {
+                (("lane", lane),): stats["active"]
+                for lane, stats in render_lanes.stats().items()
+            })
+        metrics.gauge(
+            METRIC_QUEUE_DEPTH,
+            "Renders waiting for a turn, by lane.",
+            lambda: {
+                (("lane", lane),): stats["queued"]
+                for lane, stats in render_lanes.stats().items()
+            })
+        metrics.counter(METRIC_LANE_RENDERS, "Renders routed, by lane.")
+
+        if render_cache is not None:
+            metrics.gauge(
+                METRIC_RENDER_CACHE_LOOKUPS,
+                "Render cache lookups, by result.",
+                lambda: {
+                    (("result", result),): render_cache.stats()[result]
+                    for result in ["hits_memory", "hits_disk", "misses"]
+                })
+            metrics.gauge(
+                METRIC_RENDER_CACHE_BYTES,
+                "Bytes held by the render cache, by tier.",
+                lambda: {
+                    (("tier", tier),): render_cache.stats()[f"{tier}_bytes"]
+                    for tier in ["memory", "disk"]
+                })
+
+        metrics.gauge(
+            METRIC_SHARD_LATENCY,
+            "Gateway heartbeat latency, by shard.",
+            lambda: {
+                (("shard", str(shard_id)),): latency
+                for shard_id, latency in shard_monitor.latencies().items()
+            })
+        metrics.counter(
+            METRIC_SHARD_EVENTS, "New messages received, by shard.")
+        metrics.gauge(
+            METRIC_READY,
+            "Whether warmed up and connected.",
+            lambda: {(): int(ready.is_set())})
+        add_stage_recorder(record_stage_metrics(metrics))
+
+    def count(name: str, amount: float = 1, **labels: str) -> None:
+        if metrics is not None:
+            metrics.inc(name, amount, **labels)
+
+    client_setup_hook = client.setup_hook
+    client_close = client.close
+
+    async def setup_hook():
+        nonlocal metrics_runner, shard_report
+
+        if metrics is not None:
+            metrics_runner = await start_metrics_server(
+                metrics, args.metrics_host, args.metrics_port, ready.is_set)
+
+        # Before connecting, so that no message waits on a cold start
+        if not args.disable_prewarm:
+            print_warm_up(await asyncio.to_thread(
+                warm_up, formats, emoji_source, args.prewarm_emoji))
+            await render_lanes.start()
+        else:
+            await asyncio.to_thread(warm_glyph_tables, formats)
+
+        if (
+                isinstance(client, discord.AutoShardedClient) and
+                args.shard_report_interval > 0
+        ):
+            shard_report = asyncio.create_task(
+                shard_monitor.report(args.shard_report_interval))
+
+        await client_setup_hook()
+
+    async def close():
+        if shard_report is not None:
+            shard_report.cancel()
+
+        render_lanes.shutdown(wait=False)
+        await close_http_session()
+
+        if render_cache is not None:
+            stats = render_cache.stats()
+            print(
+                f"Render cache: {stats['hit_rate']:.1%} hit rate "
+                f"({stats['hits_memory']} from memory, "
+                f"{stats['hits_disk']} from disk, {stats['misses']} misses)")
+
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+
+        await client_close()
+
+    client.setup_hook = setup_hook
+    client.close = close
+    client.ready = ready
+    client.render_lanes = render_lanes
+    client.render_flights = render_flights
 
     # Enable slash commands with Guild ID (optional)
     if args.guild is not None:
@@ -45,24 +229,65 @@ def get_client(args) -> discord.Client:
     async def on_ready():
         print(f"Logged in as: {client.user}")
 
+        # Members that Discord reports but that are not held in memory
+        members_total = sum(g.member_count or 0 for g in client.guilds)
+        members_cached = sum(len(g.members) for g in client.guilds)
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        print(
+            f"Cached {len(client.guilds)} guilds, "
+            f"{members_cached} of {members_total} members "
+            f"({members_total - members_cached} not cached), "
+            f"{len(client.cached_messages)} messages; "
+            f"peak RSS {rss // 1024} MiB")
+
+        if args.lean:
+            # Against the full profile, which would cache every member
+            saved = (members_total - members_cached) * CLIENT_MEMBER_BYTES
+            print(
+                f"Lean profile saved about {saved // 2 ** 20} MiB "
+                f"(peak RSS with every member cached: about "
+                f"{(rss * 1024 + saved) // 2 ** 20} MiB)")
+
+        ready.set()
+
         if args.guild is not None:
             await tree.sync(guild=discord.Object(id=args.guild))
             print("Guild ID provided")
 
     @client.event
-    async def on_message_edit(before, after):
-        await on_message(after)
+    async def on_shard_ready(shard_id):
+        print(f"Shard ready: {shard_id}")
+
+    @client.event
+    async def on_raw_message_edit(payload):
+        # Raw, as on_message_edit only fires for messages still in the cache,
+        # which the lean profile keeps small
+        if payload.message.author != client.user:
+            await respond(payload.message)
 
     @client.event
     async def on_message(message):
         if message.author == client.user:
             return
 
+        # New messages only, so that edits do not count twice
+        shard_id = message.guild.shard_id if message.guild is not None else 0
+        shard_monitor.event(shard_id)
+        count(METRIC_SHARD_EVENTS, shard=str(shard_id))
+
+        await respond(message)
+
+    async def respond(message):
         # If message contains any of the recognised slash triggers
         if contains_memeoff_format(message.content):
             try:
                 await handle_message(message)
+                count(METRIC_REQUESTS, outcome="ok")
             except Exception as e:
+                count(METRIC_REQUESTS, outcome="error")
+                count(METRIC_ERRORS, type=type(e).__name__)
+
                 err_msg = await message.channel.send(e, reference=message)
                 await asyncio.sleep(SLEEP_ERROR_MINOR)
 
@@ -77,35 +302,51 @@ def get_client(args) -> discord.Client:
                     pass  # user deleted it before program could
 
     async def handle_message(message):
-        if not message_has_image_reference(message):
-            raise MinorMemeoffError("Image not provided.")
+        content: str = message.content
 
-        image, image_ftype = await download_image_from_message(message)
+        # Reject bad commands before fetching anything
+        plan = parse_content(content)
 
-        if image_ftype not in SUPPORTED_FILE_TYPES:
-            raise MinorMemeoffError(
-                f"Image file type '{image_ftype}' is not supported.")
+        if len(message.attachments) == 0:
+            await resolve_reference(message)
 
-        content: str = message.content
+        if not message_has_image_reference(message):
+            raise MinorMemeoffError("Image not provided.")
+
+        # File type is checked from the downloaded bytes, not the URL
+        image_url = image_url_from_message(message)
 
         # Options
         anonymous: bool = (
                 args.force_anon or
-                (not args.disable_anon and COMMAND_ANON in content)
+                (not args.disable_anon and plan.anon)
         )
 
-        image = process_content(
-            image=image,
-            content=content,
-            formats=formats,
-            emoji_source=emoji_source
-        )
+        # Lanes are chosen by the size Discord reports, before downloading
+        lane = render_lanes.route(
+            render_features(image_size_from_message(message), plan))
+        count(METRIC_LANE_RENDERS, lane=lane.name)
 
-        # Send response
-        with BytesIO() as image_binary:
-            image.save(image_binary, image_ftype)
-            image_binary.seek(0)
+        # Identical requests share one render, which only the first holds a
+        # turn for; the rest count only towards their users' pending renders
+        flight_key = render_flight_key(image_url, content)
+
+        if render_flights.in_flight(flight_key):
+            admission = lane.scheduler.pending(message.author.id)
+        else:
+            admission = lane.scheduler.slot(
+                message.guild.id if message.guild is not None else None,
+                message.author.id
+            )
 
+        async with admission:
+            output, image_ftype = await render_flights.run(
+                flight_key,
+                lambda: render_message(lane, plan, image_url, content)
+            )
+
+        # Send response
+        with stage(STAGE_SEND), BytesIO(output) as image_binary:
             await message.channel.send(
                 message.author.mention if not anonymous else "",
                 file=discord.File(
@@ -118,10 +359,78 @@ def get_client(args) -> discord.Client:
                 )
             )
 
+        count(METRIC_BYTES_OUT, len(output))
+
         # Delete trigger message on success
         try:
-            await message.delete()
+            with stage(STAGE_DELETE):
+                await message.delete()
         except discord.errors.NotFound:
             pass  # user deleted it before program could
 
+    async def resolve_reference(message) -> None:
+        # Replied-to messages arrive with the reply when Discord has them,
+        # else they are fetched rather than relying on the message cache
+        reference = message.reference
+
+        if (
+                reference is None or
+                reference.message_id is None or
+                isinstance(reference.resolved, discord.Message)
+        ):
+            return
+
+        channel = client.get_channel(reference.channel_id) or message.channel
+
+        try:
+            reference.resolved = await channel.fetch_message(
+                reference.message_id)
+        except discord.HTTPException:
+            pass  # deleted, or not visible to the program
+
+    async def render_message(lane, plan, image_url: str, content: str):
+        image_bytes = await download_image_bytes(image_url)
+        count(METRIC_BYTES_IN, len(image_bytes))
+
+        # Trust the bytes over the URL, which may be misnamed
+        image_ftype = image_ftype_from_bytes(image_bytes)
+
+        if image_ftype not in SUPPORTED_FILE_TYPES:
+            raise MinorMemeoffError("Image file type is not supported.")
+
+        # Identical image and command renders to identical bytes
+        cache_key: Optional[str] = None
+
+        if render_cache is not None:
+            cache_key = render_cache_key(
+                image_bytes,
+                content,
+                args.emoji,
+                image_ftype,
+                args.resample_down,
+                args.resample_up,
+                str(args.max_upload_bytes)
+            )
+            output = render_cache.get(cache_key)
+
+            if output is not None:
+                return output, image_ftype_from_bytes(output)
+
+        output, image_ftype = await render_lanes.render_bytes(
+            lane,
+            render_features(image_size_from_bytes(image_bytes), plan),
+            image_bytes,
+            image_url,
+            image_ftype,
+            content,
+            resample_down=args.resample_down,
+            resample_up=args.resample_up,
+            max_bytes=args.max_upload_bytes
+        )
+
+        if render_cache is not None:
+            render_cache.put(cache_key, output)
+
+        return output, image_ftype
+
     return client
@@ -0,0 +1,90 @@
+# Copyright (c) 2021-2025 r3w0p
+# The following code can be redistributed and/or
+# modified under the terms of the GPL-3.0 License.
+import re
+from functools import lru_cache
+from typing import NamedTuple, Tuple
+
+from src.constants import *
+from src.exceptions import MinorMemeoffError
+
+# FE0E: emoji to be presented as text
+# FE0F: emoji to be presented as an image (color, animation)
+# 2642: male variant
+# 2640: female variant
+# 200D: zero-width joiner, joins emoji into a single glyph
+_VARIANT_SELECTORS = str.maketrans(
+    dict.fromkeys("\uFE0E\uFE0F\u2642\u2640\u200D"))
+
+_RE_COMMAND = re.compile(REGEX_PATTERN_SLASH)
+_RE_FORMAT = re.compile("|".join(re.escape(c) for c in COMMANDS_FORMATS))
+
+
+class FormatCommand(NamedTuple):
+    command: str
+    text: str
+
+
+class CommandPlan(NamedTuple):
+    """The formats requested by a message, in the order to apply them, and
+    its options."""
+    formats: Tuple[FormatCommand, ...]
+    anon: bool
+    dark: bool
+
+
+def contains_memeoff_format(s: str) -> bool:
+    # Most messages have no slash at all
+    return "/" in s and _RE_FORMAT.search(s) is not None
+
+
+def remove_variant_selectors(content: str) -> str:
+    return content.translate(_VARIANT_SELECTORS)
+
+
+def normalise_content(content: str) -> str:
+    content = remove_variant_selectors(content)
+
+    # Remove spoiler marks at start and end, if they exist
+    if (
+            content.startswith(DELIM_SPOILER) and
+            content.endswith(DELIM_SPOILER)
+    ):
+        content = content[len(DELIM_SPOILER):][:-len(DELIM_SPOILER)]
+
+    return content
+
+
+@lru_cache(maxsize=COMMAND_PARSE_CACHE_SIZE)
+def parse_content(content: str) -> CommandPlan:
+    """Parses a message into a CommandPlan, or raises MinorMemeoffError if
+    it does not request any formats."""
+    content = normalise_content(content)
+    formats = []
+
+    # Each command takes the text up to the next command, if any
+    command = None
+    text_start = 0
+
+    for match in _RE_COMMAND.finditer(content):
+        if command is not None:
+            formats.append(FormatCommand(
+                command, content[text_start:match.start()].strip()))
+
+        command = match.group()
+        text_start = match.end()
+
+    if command is not None:
+        formats.append(FormatCommand(command, content[text_start:].strip()))
+
+    # Options take text like formats do, which is then ignored
+    formats = tuple(f for f in formats if f.command in COMMANDS_FORMATS)
+
+    if len(formats) == 0:
+        raise MinorMemeoffError("No meme format given.")
+
+    return CommandPlan(
+        formats=formats,
+        anon=COMMAND_ANON in content,
+        dark=COMMAND_DARK in content
+    )
@@ -3,10 +3,11 @@
 # modified under the terms of the GPL-3.0 License.
 
 from pathlib import Path
-from typing import List
+from typing import List, Tuple
 
 MEMEOFF_VERSION: str = "1.0.0"
 MEMEOFF_URL_WIKI: str = "https://github.com/r3w0p/memeoff/wiki"
+MEMEOFF_URL_GITHUB: str = "https://github.com/r3w0p/memeoff"
 
 NAME_MEMEOFF: str = "memeoff"
 NAME_DEMOTIV: str = "demotiv"
@@ -45,30 +46,90 @@ COMMANDS_ALL: List[str] = COMMANDS_FORMATS + COMMANDS_OPTIONS
 
 REGEX_PATTERN_SLASH: str = '|'.join([f"({c})" for c in COMMANDS_ALL])
 
+COMMAND_PARSE_CACHE_SIZE: int = 1024
+
 DELIM_SPOILER: str = "||"
 DELIM_NEWLINE: str = "##"
 DELIM_CONTEXT: str = "//"
 
 DIR_CONFIG: str = "config"
 DIR_FONTS: str = "fonts"
+DIR_EMOJI: str = "emoji"
 DIR_TITLE: str = "title"
 DIR_SUBTITLE: str = "subtitle"
 
+# Images are rendered at their own width, resampled once into this range
 IMAGE_WIDTH_MIN: int = 200
-IMAGE_WIDTH_FORCE: int = 500
+IMAGE_WIDTH_MAX: int = 500
+
+# Format layouts are designed at this width and scaled to each image's
+IMAGE_WIDTH_LAYOUT: int = 500
+IMAGE_MAX_PIXELS: int = 8192 * 8192
+
+# Bytes needed to identify a file type, and the most read to find its size
+IMAGE_HEADER_MAGIC_BYTES: int = 12
+IMAGE_HEADER_MAX_BYTES: int = 1024 * 1024
+
+# Images are only shrunk cheaply (JPEG draft, integer reduce) down to this
+# many times the target width, leaving the rest to the final resample
+IMAGE_REDUCING_GAP: float = 2.0
+
+RESAMPLE_NEAREST: str = "nearest"
+RESAMPLE_BOX: str = "box"
+RESAMPLE_BILINEAR: str = "bilinear"
+RESAMPLE_HAMMING: str = "hamming"
+RESAMPLE_BICUBIC: str = "bicubic"
+RESAMPLE_LANCZOS: str = "lanczos"
+
+RESAMPLE_ALL: List[str] = [
+    RESAMPLE_NEAREST,
+    RESAMPLE_BOX,
+    RESAMPLE_BILINEAR,
+    RESAMPLE_HAMMING,
+    RESAMPLE_BICUBIC,
+    RESAMPLE_LANCZOS
+]
+
+IMAGE_RESAMPLE_DOWN: str = RESAMPLE_BICUBIC
+IMAGE_RESAMPLE_UP: str = RESAMPLE_BICUBIC
 
 FILE_TYPE_JPG: str = "JPG"
 FILE_TYPE_JPEG: str = "JPEG"
 FILE_TYPE_PNG: str = "PNG"
 FILE_TYPE_WEBP: str = "WEBP"
+FILE_TYPE_GIF: str = "GIF"
 
 SUPPORTED_FILE_TYPES: List[str] = [
     FILE_TYPE_JPG,
     FILE_TYPE_JPEG,
     FILE_TYPE_PNG,
-    FILE_TYPE_WEBP
+    FILE_TYPE_WEBP,
+    FILE_TYPE_GIF
 ]
 
+DISCORD_CDN_HOSTS: List[str] = [
+    "cdn.discordapp.com",
+    "media.discordapp.net"
+]
+DISCORD_URL_GATEWAY_BOT: str = "https://discord.com/api/v10/gateway/bot"
+
+SCHEDULER_MAX_ACTIVE: int = 4
+SCHEDULER_MAX_QUEUED: int = 64
+SCHEDULER_GUILD_MAX_ACTIVE: int = 2
+SCHEDULER_USER_MAX_PENDING: int = 2
+
+# Discord's default upload limit
+ENCODE_MAX_BYTES: int = 10 * 1024 * 1024
+ENCODE_QUALITY_JPEG: int = 85
+ENCODE_QUALITY_WEBP: int = 85
+ENCODE_QUALITY_MIN: int = 40
+ENCODE_PNG_COMPRESS_LEVEL: int = 6
+ENCODE_DOWNSCALE: float = 0.75
+
+ANIMATION_MAX_FRAMES: int = 300
+ANIMATION_DURATION_DEFAULT: int = 100
+ANIMATION_PALETTE_SAMPLES: int = 4
+
 SLASH_MEMEOFF_HELP: str = "help"
 SLASH_MEMEOFF_VERSION: str = "version"
 
@@ -89,10 +150,127 @@ EMOJI_STYLES_ALL: List[str] = [
     EMOJI_STYLE_TWITTER
 ]
 
+EMOJI_CACHE_MEMORY_MAX_BYTES: int = 32 * 1024 * 1024
+EMOJI_CACHE_DISK_MAX_BYTES: int = 512 * 1024 * 1024
+
+RENDER_CACHE_MEMORY_MAX_BYTES: int = 64 * 1024 * 1024
+RENDER_CACHE_DISK_MAX_BYTES: int = 1024 * 1024 * 1024
+
+STAGE_DOWNLOAD: str = "download"
+STAGE_DECODE: str = "decode"
+STAGE_RESHAPE: str = "reshape"
+STAGE_APPLY: str = "apply"
+STAGE_FONT_FIT: str = "font_fit"
+STAGE_DRAW: str = "draw"
+STAGE_ENCODE: str = "encode"
+STAGE_FRAMES: str = "frames"
+STAGE_OVERLAY: str = "overlay"
+STAGE_COMPOSITE: str = "composite"
+STAGE_SEND: str = "send"
+STAGE_DELETE: str = "delete"
+
+SERVICE_HOST_DEFAULT: str = "127.0.0.1"
+SERVICE_PORT_DEFAULT: int = 8080
+SERVICE_PATH_RENDER: str = "/render"
+SERVICE_PATH_HEALTH: str = "/health"
+
+METRICS_HOST_DEFAULT: str = "127.0.0.1"
+METRICS_PATH: str = "/metrics"
+READY_PATH: str = "/ready"
+METRICS_CONTENT_TYPE: str = "text/plain; version=0.0.4; charset=utf-8"
+METRICS_BUCKETS_SECONDS: List[float] = [
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+    10.0, 30.0
+]
+METRIC_STAGE_SECONDS: str = f"{NAME_MEMEOFF}_stage_seconds"
+METRIC_RENDERS: str = f"{NAME_MEMEOFF}_format_renders_total"
+METRIC_REQUESTS: str = f"{NAME_MEMEOFF}_requests_total"
+METRIC_ERRORS: str = f"{NAME_MEMEOFF}_errors_total"
+METRIC_BYTES_IN: str = f"{NAME_MEMEOFF}_bytes_in_total"
+METRIC_BYTES_OUT: str = f"{NAME_MEMEOFF}_bytes_out_total"
+METRIC_QUEUE_ACTIVE: str = f"{NAME_MEMEOFF}_scheduler_active"
+METRIC_QUEUE_DEPTH: str = f"{NAME_MEMEOFF}_scheduler_queued"
+METRIC_SHARD_LATENCY: str = f"{NAME_MEMEOFF}_shard_latency_seconds"
+METRIC_READY: str = f"{NAME_MEMEOFF}_ready"
+METRIC_SHARD_EVENTS: str = f"{NAME_MEMEOFF}_shard_events_total"
+METRIC_LANE_RENDERS: str = f"{NAME_MEMEOFF}_lane_renders_total"
+METRIC_RENDER_CACHE_LOOKUPS: str = f"{NAME_MEMEOFF}_render_cache_lookups"
+METRIC_RENDER_CACHE_BYTES: str = f"{NAME_MEMEOFF}_render_cache_bytes"
+
+CLIENT_LEAN_MAX_MESSAGES: int = 100
+
+# Approximate memory held per cached member, for reporting what the lean
+# profile saves
+CLIENT_MEMBER_BYTES: int = 1024
+
+# Glyph tables are measured at this size, over printable ASCII
+GLYPH_TABLE_SIZE: int = 256
+GLYPH_TABLE_FIRST: int = 0x20
+GLYPH_TABLE_LAST: int = 0x7E
+
+# Glyphs and pairs outside the tables, measured on use and kept per font
+GLYPH_OTHER_MAX: int = 4096
+
+# Glyph heights kept, each for one font at one size
+GLYPH_HEIGHT_CACHE_SIZE: int = 16384
+
+PREWARM_STEP_PLUGINS: str = "plugins"
+PREWARM_STEP_FONTS: str = "fonts"
+PREWARM_STEP_EMOJI: str = "emoji"
+PREWARM_STEP_RENDER: str = "render"
+PREWARM_TEXT: str = "Prewarm"
+PREWARM_EMOJI: List[str] = [
+    "\U0001F602", "\U0001F62D", "\U0001F480", "\U0001F525"
+]
+PREWARM_FONT_SEARCH_DEPTH: int = 4
+PREWARM_IMAGE_SIZE: Tuple[int, int] = (
+    IMAGE_WIDTH_LAYOUT, IMAGE_WIDTH_LAYOUT * 3 // 4
+)
+
+SHARD_REPORT_INTERVAL: float = 60.0
+SHARD_RESTART_DELAY: float = 5.0
+ENV_TOKEN: str = "MEMEOFF_TOKEN"
+
 SLEEP_ERROR_MINOR: int = 10
 
+DOWNLOAD_TIMEOUT_TOTAL: float = 30.0
+DOWNLOAD_TIMEOUT_CONNECT: float = 10.0
+DOWNLOAD_TIMEOUT_READ: float = 10.0
+DOWNLOAD_CHUNK_SIZE: int = 64 * 1024
+DOWNLOAD_MAX_BYTES: int = 25 * 1024 * 1024
+DOWNLOAD_POOL_SIZE: int = 32
+DOWNLOAD_POOL_SIZE_PER_HOST: int = 8
+DOWNLOAD_KEEPALIVE_TIMEOUT: float = 30.0
+
+# Render cost model: coefficients of the features from render_features, in
+# seconds, before any renders have been timed
+COST_PRIOR: Tuple[float, ...] = (0.02, 0.008, 0.0, 0.05, 0.01, 0.002)
+COST_PRIOR_STRENGTH: float = 4.0
+COST_DECAY: float = 0.99
+COST_LINE_CHARS: int = 20
+
+# Renders predicted to take longer go to the slow lane (0 for one lane)
+LANE_SLOW_SECONDS: float = 0.25
+LANE_SLOW_MAX_ACTIVE: int = 1
+LANE_FAST: str = "fast"
+LANE_SLOW: str = "slow"
+
+RENDER_MODE_INLINE: str = "inline"
+RENDER_MODE_THREAD: str = "thread"
+RENDER_MODE_PROCESS: str = "process"
+
+RENDER_MODES_ALL: List[str] = [
+    RENDER_MODE_INLINE,
+    RENDER_MODE_THREAD,
+    RENDER_MODE_PROCESS
+]
+
+RENDER_WORKERS_DEFAULT: int = 2
+RENDER_RECYCLE_DEFAULT: int = 500
+
 PATH_MEMEOFF: Path = Path(__file__).parent.parent.absolute()
 PATH_FONTS: Path = PATH_MEMEOFF / DIR_CONFIG / DIR_FONTS
+PATH_EMOJI: Path = PATH_MEMEOFF / DIR_CONFIG / DIR_EMOJI
 
 PATH_FONTS_DEMOTIV_TITLE: Path = PATH_FONTS / NAME_DEMOTIV / DIR_TITLE
 PATH_FONTS_DEMOTIV_SUBTITLE: Path = PATH_FONTS / NAME_DEMOTIV / DIR_SUBTITLE
@@ -0,0 +1,138 @@
+# Copyright (c) 2021-2025 r3w0p
+# The following code can be redistributed and/or
+# modified under the terms of the GPL-3.0 License.
+from math import ceil
+from typing import List, Optional, Sequence, Tuple
+
+from pilmoji.helpers import NodeType, to_nodes
+
+from src.commands import CommandPlan
+from src.constants import *
+
+
+def render_features(
+        size: Optional[Tuple[int, int]],
+        plan: CommandPlan
+) -> Tuple[float, ...]:
+    """Returns what the cost of a render is predicted from: a constant, the
+    megapixels decoded, the number of chained formats, the megapixels they
+    are applied to, and the number of lines and emoji they draw.
+
+    Images of unknown `size` are taken to be IMAGE_WIDTH_MAX square.
+    """
+    width, height = size if size is not None else (
+        IMAGE_WIDTH_MAX, IMAGE_WIDTH_MAX)
+
+    # As reshape_image resizes it before the first format is applied
+    width_render = min(max(width, IMAGE_WIDTH_MIN), IMAGE_WIDTH_MAX)
+    megapixels = width_render * height * width_render / width / 1e6
+
+    lines = 0
+    emoji = 0
+
+    for command in plan.formats:
+        for part in command.text.split(DELIM_NEWLINE):
+            lines += max(1, ceil(len(part.strip()) / COST_LINE_CHARS))
+
+        for line in to_nodes(command.text):
+            emoji += sum(1 for node in line if node.type is not NodeType.text)
+
+    formats = len(plan.formats)
+
+    return (
+        1.0,
+        width * height / 1e6,
+        formats,
+        megapixels * formats,
+        lines,
+        emoji
+    )
+
+
+class CostModel:
+    """Predicts how many seconds a render takes from its features, fitted
+    by least squares to the timings of renders that have finished.
+
+    Coefficients start at `prior`, which `strength` observations' worth of
+    weight keep them close to until there are timings enough to say
+    otherwise. Each timing's weight decays by `decay` with every one
+    observed after it, so the model follows the machine it runs on.
+    """
+
+    def __init__(
+            self,
+            prior: Sequence[float] = COST_PRIOR,
+            strength: float = COST_PRIOR_STRENGTH,
+            decay: float = COST_DECAY
+    ) -> None:
+        n = len(prior)
+
+        self._prior = list(prior)
+        self._strength = strength
+        self._decay = decay
+
+        self._xtx: List[List[float]] = [[0.0] * n for _ in range(n)]
+        self._xty: List[float] = [0.0] * n
+        self._coefficients: List[float] = list(prior)
+
+        self.observed: int = 0
+
+    @property
+    def coefficients(self) -> List[float]:
+        return list(self._coefficients)
+
+    def predict(self, features: Sequence[float]) -> float:
+        return max(0.0, sum(
+            c * x for c, x in zip(self._coefficients, features)))
+
+    def observe(self, features: Sequence[float], seconds: float) -> None:
+        n = len(self._prior)
+
+        for i in range(n):
+            self._xty[i] = self._xty[i] * self._decay + features[i] * seconds
+
+            for j in range(n):
+                self._xtx[i][j] = (
+                    self._xtx[i][j] * self._decay + features[i] * features[j]
+                )
+
+        # Ridge regression towards the prior: (XᵀX + sI) c = Xᵀy + s prior
+        self._coefficients = _solve(
+            [
+                [
+                    self._xtx[i][j] + (self._strength if i == j else 0.0)
+                    for j in range(n)
+                ]
+                for i in range(n)
+            ],
+            [
+                self._xty[i] + self._strength * self._prior[i]
+                for i in range(n)
+            ]
+        )
+        self.observed += 1
+
+
+def _solve(a: List[List[float]], b: List[float]) -> List[float]:
+    # Gaussian elimination with partial pivoting; `a` is positive definite
+    n = len(b)
+    a = [row[:] + [b[i]] for i, row in enumerate(a)]
+
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(a[r][col]))
+        a[col], a[pivot] = a[pivot], a[col]
+
+        for row in range(col + 1, n):
+            factor = a[row][col] / a[col][col]
+
+            for k in range(col, n + 1):
+                a[row][k] -= factor * a[col][k]
+
+    x = [0.0] * n
+
+    for row in reversed(range(n)):
+        x[row] = (
+            a[row][n] - sum(a[row][k] * x[k] for k in range(row + 1, n))
+        ) / a[row][row]
+
+    return x
@@ -0,0 +1,76 @@
+# Copyright (c) 2021-2025 r3w0p
+# The following code can be redistributed and/or
+# modified under the terms of the GPL-3.0 License.
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, Optional
+
+from pilmoji.source import BaseSource
+
+from src.cache import ByteCache
+from src.constants import *
+
+
+class CachedEmojiSource(BaseSource):
+    """A pilmoji source that caches the images of another source.
+
+    Emoji images are kept in an in-memory LRU capped at `memory_max_bytes`,
+    backed by an on-disk store under `path` capped at `disk_max_bytes`.
+    Only misses in both tiers reach the wrapped source. Emoji it fails to
+    return are not cached, as a missing emoji cannot be told apart from a
+    failed request and is fetched again next time. Pass an instance of
+    this class (not the class itself) to Pilmoji so that the cache is shared
+    between drawing contexts.
+    """
+
+    def __init__(
+            self,
+            source_class,
+            path: Optional[Path] = None,
+            memory_max_bytes: int = EMOJI_CACHE_MEMORY_MAX_BYTES,
+            disk_max_bytes: int = EMOJI_CACHE_DISK_MAX_BYTES
+    ) -> None:
+        self._source_class = source_class
+        self._source: BaseSource = source_class()
+
+        self._cache = ByteCache(
+            memory_max_bytes=memory_max_bytes,
+            path=path,
+            disk_max_bytes=disk_max_bytes
+        )
+
+    def __getstate__(self) -> dict:
+        return {"source_class": self._source_class, "cache": self._cache}
+
+    def __setstate__(self, state: dict) -> None:
+        self._source_class = state["source_class"]
+        self._source = self._source_class()
+        self._cache = state["cache"]
+
+    def get_emoji(self, emoji: str, /) -> Optional[BytesIO]:
+        return self._get(emoji, self._source.get_emoji, emoji)
+
+    def get_discord_emoji(self, id: int, /) -> Optional[BytesIO]:
+        return self._get(
+            f"discord-{id}", self._source.get_discord_emoji, id)
+
+    def stats(self) -> Dict[str, float]:
+        return self._cache.stats()
+
+    def _get(self, key: str, fetch, *fetch_args) -> Optional[BytesIO]:
+        data = self._cache.get(key)
+
+        if data is None:
+            stream = fetch(*fetch_args)
+
+            if stream is None:
+                return None
+
+            data = stream.getvalue()
+
+            if len(data) == 0:
+                return None
+
+            self._cache.put(key, data)
+
+        return BytesIO(data)
@@ -10,5 +10,13 @@ class MinorMemeoffError(MemeoffError):
     """A minor error to communicate back to the end user."""
 
 
+class BusyMemeoffError(MinorMemeoffError):
+    """A minor error for when there is no capacity to take on more work."""
+
+
+class UnsupportedMemeoffError(MinorMemeoffError):
+    """A minor error for an image whose file type is not supported."""
+
+
 class MajorMemeoffError(MemeoffError):
     """A major error from which the program cannot continue."""
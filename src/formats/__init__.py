@@ -3,13 +3,249 @@
 # modified under the terms of the GPL-3.0 License.
 
 from abc import ABC, abstractmethod
+from functools import lru_cache
 from textwrap import wrap
-from typing import List
+from typing import Dict, List, NamedTuple, Tuple
 
-from PIL import ImageFile, ImageFont
+from PIL import Image, ImageColor, ImageFile, ImageFont, ImagePalette
 from pilmoji import Pilmoji
+from pilmoji.helpers import getsize as pilmoji_getsize
 
-from src.constants import DELIM_NEWLINE
+from src.constants import DELIM_NEWLINE, IMAGE_WIDTH_LAYOUT, STAGE_DRAW, \
+    STAGE_FONT_FIT
+from src.glyphs import get_glyph_table, text_height
+from src.stages import stage
+
+_FONT_CACHE_SIZE = 512
+
+# Fits made in this process and the lines measured for them
+_fit_totals: Dict[str, int] = {"fits": 0, "measurements": 0}
+
+
+class FontFit(NamedTuple):
+    font: ImageFont.FreeTypeFont
+    size: int
+    measurements: int
+
+
+class DrawText(NamedTuple):
+    xy: Tuple[int, int]
+    text: str
+    font: ImageFont.FreeTypeFont
+    fill: object
+    stroke_width: int = 0
+    stroke_fill: object = None
+    emoji_scale_factor: float = 1.0
+    emoji_position_offset: Tuple[int, int] = (0, 0)
+
+
+class CanvasPlan:
+    """Plans an image grown by solid borders, as by repeated calls to
+    ImageOps.expand, so that the result can be allocated once.
+
+    Each `expand` records the strips of the new border instead of copying
+    the image into a bigger one; `render` then pastes the source image and
+    fills the strips on a single output canvas.
+    """
+
+    def __init__(self, width: int, height: int) -> None:
+        self.width = width
+        self.height = height
+
+        self._source_xy: Tuple[int, int] = (0, 0)
+        self._strips: List[Tuple[Tuple[int, int, int, int], object]] = []
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.width, self.height
+
+    @property
+    def source_xy(self) -> Tuple[int, int]:
+        return self._source_xy
+
+    def expand(self, border: Tuple[int, int, int, int], fill) -> None:
+        left, top, right, bottom = border
+        width = left + self.width + right
+        height = top + self.height + bottom
+
+        self._source_xy = (
+            self._source_xy[0] + left, self._source_xy[1] + top)
+        self._strips = [
+            ((x0 + left, y0 + top, x1 + left, y1 + top), f)
+            for (x0, y0, x1, y1), f in self._strips
+        ]
+
+        for box in [
+            (0, 0, width, top),
+            (0, height - bottom, width, height),
+            (0, top, left, height - bottom),
+            (width - right, top, width, height - bottom)
+        ]:
+            if box[2] > box[0] and box[3] > box[1]:
+                self._strips.append((box, fill))
+
+        self.width = width
+        self.height = height
+
+    def render(self, image) -> ImageFile:
+        if image.palette:
+            palette = ImagePalette.ImagePalette(palette=image.getpalette())
+        else:
+            palette = None
+
+        # Resolve colours first, as a palette may gain entries for them
+        strips = []
+
+        for box, fill in self._strips:
+            color = (
+                ImageColor.getcolor(fill, image.mode)
+                if isinstance(fill, str) else fill
+            )
+
+            if palette and isinstance(color, tuple):
+                color = palette.getcolor(color)
+
+            strips.append((box, color))
+
+        canvas = Image.new(image.mode, self.size)
+
+        if palette:
+            canvas.putpalette(palette.palette)
+
+        canvas.paste(image, self._source_xy)
+
+        for box, color in strips:
+            canvas.paste(color, box)
+
+        return canvas
+
+
+@lru_cache(maxsize=_FONT_CACHE_SIZE)
+def get_font(font_path: str, size: int) -> ImageFont.FreeTypeFont:
+    """Loads a font, sharing one object per path and size in the process."""
+    return ImageFont.truetype(font_path, size)
+
+
+def fit_font(
+        text_lines,
+        width: float,
+        font_path: str,
+        init_font_size: int,
+        emoji_scale_factor: float = None
+) -> FontFit:
+    """Finds the largest font size, up to `init_font_size`, at which every
+    line is at most `width` wide.
+
+    The size is estimated from the font's glyph tables, then confirmed by
+    measuring each line with the same emoji-aware sizing that Pilmoji uses
+    at that size and the next. Only if the estimate is off by more than one
+    are the remaining sizes binary searched. The lines measured are counted
+    in the result and in fit_font_stats.
+    """
+    with stage(STAGE_FONT_FIT):
+        fit = _fit_font(
+            text_lines, width, font_path, init_font_size, emoji_scale_factor)
+
+    _fit_totals["fits"] += 1
+    _fit_totals["measurements"] += fit.measurements
+
+    return fit
+
+
+def fit_font_stats() -> Dict[str, int]:
+    """Returns how many fits have been made in this process and how many
+    lines they measured in all."""
+    return dict(_fit_totals)
+
+
+def _fit_font(
+        text_lines,
+        width: float,
+        font_path: str,
+        init_font_size: int,
+        emoji_scale_factor: float = None
+) -> FontFit:
+    measurements = 0
+
+    def fits(size: int) -> bool:
+        nonlocal measurements
+        font = get_font(font_path, size)
+
+        for text in text_lines:
+            measurements += 1
+
+            if pilmoji_getsize(
+                    text,
+                    font,
+                    emoji_scale_factor=(
+                        emoji_scale_factor if emoji_scale_factor is not None
+                        else 1.0
+                    ))[0] > width:
+                return False
+
+        return True
+
+    # Widths scale with size, so the glyph tables give the size at which
+    # the widest line should just fit, which is then checked for real
+    table = get_glyph_table(font_path)
+    rate = max((
+        table.line_rate(
+            text,
+            emoji_scale_factor if emoji_scale_factor is not None else 1.0
+        )
+        for text in text_lines
+    ), default=0.0)
+    estimate = int(width / rate) if rate > 0 else init_font_size
+    estimate = min(max(estimate, 1), init_font_size)
+
+    # Largest fitting size lies in [low, high]; size 1 is the floor
+    if fits(estimate):
+        low, high = estimate, init_font_size
+
+        if low < high:
+            if fits(low + 1):
+                low += 1
+            else:
+                high = low
+
+    else:
+        low, high = 1, max(1, estimate - 1)
+
+        if low < high:
+            if fits(high):
+                low = high
+            else:
+                high -= 1
+
+    while low < high:
+        mid = (low + high + 1) // 2
+
+        if fits(mid):
+            low = mid
+        else:
+            high = mid - 1
+
+    return FontFit(get_font(font_path, low), low, measurements)
+
+
+def fit_font_sizes(init_font_size: int, depth: int) -> List[int]:
+    """Returns a spread of sizes from `init_font_size` down, those a
+    binary search from it would try in its first `depth` steps."""
+    sizes = {init_font_size}
+    ranges = [(1, init_font_size - 1)]
+
+    for _ in range(depth):
+        ranges_next = []
+
+        for low, high in ranges:
+            if low < high:
+                mid = (low + high + 1) // 2
+                sizes.add(mid)
+                ranges_next += [(mid, high), (low, mid - 1)]
+
+        ranges = ranges_next
+
+    return sorted(sizes)
 
 
 class MemeFormat(ABC):
@@ -24,6 +260,25 @@ class MemeFormat(ABC):
     ) -> ImageFile:
         """"""
 
+    @abstractmethod
+    def fonts(self) -> List[Tuple[str, int]]:
+        """Returns the path and initial size of each font used."""
+
+    @staticmethod
+    def _layout_scale(width: int) -> float:
+        """Returns how much a layout designed at IMAGE_WIDTH_LAYOUT is scaled
+        by to lay out an image `width` wide."""
+        return width / IMAGE_WIDTH_LAYOUT
+
+    @staticmethod
+    def _scaled(value, scale: float):
+        """Scales a length, or a tuple of them, from a layout to whole
+        pixels."""
+        if isinstance(value, tuple):
+            return tuple(round(v * scale) for v in value)
+
+        return round(value * scale)
+
     @staticmethod
     def _generate_font(
             text_lines,
@@ -33,32 +288,55 @@ class MemeFormat(ABC):
             font_scale=1.0,
             emoji_scale_factor: float = None
     ):
-        font = ImageFont.truetype(font_path, init_font_size)
-        pilmoji = Pilmoji(image)
-        width_scaled = image.size[0] * font_scale
-        current_font_size = init_font_size
+        return fit_font(
+            text_lines=text_lines,
+            width=image.size[0] * font_scale,
+            font_path=font_path,
+            init_font_size=init_font_size,
+            emoji_scale_factor=emoji_scale_factor
+        ).font
 
-        for text in text_lines:
-            while pilmoji.getsize(
-                    text=text,
-                    font=font,
-                    emoji_scale_factor=emoji_scale_factor)[0] > width_scaled:
-                current_font_size -= 1
-                font = ImageFont.truetype(font_path, current_font_size)
-
-        pilmoji.close()
-        return font
+    @staticmethod
+    def _measure_lines(
+            text_lines,
+            font,
+            emoji_scale_factor: float = None
+    ) -> List[Tuple[int, int]]:
+        """Measures each line once, as Pilmoji would draw it."""
+        return [
+            pilmoji_getsize(
+                text,
+                font,
+                emoji_scale_factor=(
+                    emoji_scale_factor if emoji_scale_factor is not None
+                    else 1.0
+                ))
+            for text in text_lines
+        ]
 
     @staticmethod
-    def _get_max_text_height(text_lines, font):
-        max_text_height = 0
+    def _draw_text(image, draw_ops: List[DrawText], emoji_source) -> None:
+        """Draws every laid out line with one Pilmoji context."""
+        if len(draw_ops) == 0:
+            return
 
-        for text in text_lines:
-            text_size = font.getsize(text)
-            if text_size[1] > max_text_height:
-                max_text_height = text_size[1]
+        with stage(STAGE_DRAW), \
+                Pilmoji(image, source=emoji_source) as pilmoji:
+            for op in draw_ops:
+                pilmoji.text(
+                    op.xy,
+                    op.text,
+                    fill=op.fill,
+                    font=op.font,
+                    stroke_width=op.stroke_width,
+                    stroke_fill=op.stroke_fill,
+                    emoji_scale_factor=op.emoji_scale_factor,
+                    emoji_position_offset=op.emoji_position_offset)
 
-        return max_text_height
+    @staticmethod
+    def _get_max_text_height(text_lines, font):
+        return max(
+            (text_height(font, text) for text in text_lines), default=0)
 
     @staticmethod
     def _wrap_new_lines(
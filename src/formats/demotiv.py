@@ -1,11 +1,12 @@
 # Copyright (c) 2021-2025 r3w0p
 # The following code can be redistributed and/or
 # modified under the terms of the GPL-3.0 License.
-from PIL import ImageFile, ImageOps
-from pilmoji import Pilmoji
+from typing import List, Tuple
+
+from PIL import ImageFile
 
 from src.constants import DELIM_CONTEXT
-from src.formats import MemeFormat
+from src.formats import CanvasPlan, DrawText, MemeFormat, fit_font
 
 _BORDER_PAD_INNER = 3
 _BORDER_PAD_OUTER_TOP = 55
@@ -13,6 +14,7 @@ _BORDER_PAD_OUTER_SIDES_INIT = 75
 _BORDER_PAD_OUTER_SIDES_FINAL = 25
 
 _TITLE_PAD_ABOVE = 38
+_TITLE_PAD_BELOW = 5
 _TITLE_WORD_WRAP = 18
 _TITLE_FONT_SIZE_INIT = 60
 _TITLE_FONT_SCALE = 0.9
@@ -21,6 +23,8 @@ _TITLE_EMOJI_POS_OFFSET = (0, 8)
 
 _SUBTITLE_PAD_ABOVE_SOLO = 20
 _SUBTITLE_PAD_BELOW = 30
+_SUBTITLE_PAD_END = 5
+_SUBTITLE_LINE_SPACE = 5
 _SUBTITLE_WORD_WRAP = 54
 _SUBTITLE_FONT_SIZE_INIT = 26
 _SUBTITLE_FONT_SCALE = 1.0
@@ -36,6 +40,12 @@ class MemeFormatDemotiv(MemeFormat):
         self._path_font_title = path_font_title
         self._path_font_subtitle = path_font_subtitle
 
+    def fonts(self) -> List[Tuple[str, int]]:
+        return [
+            (self._path_font_title, _TITLE_FONT_SIZE_INIT),
+            (self._path_font_subtitle, _SUBTITLE_FONT_SIZE_INIT)
+        ]
+
     def apply(
             self,
             image: ImageFile,
@@ -54,85 +64,96 @@ class MemeFormatDemotiv(MemeFormat):
         subtitle_lines = self._wrap_new_lines(
             text_subtitle, _SUBTITLE_WORD_WRAP)
 
-        border_inner = (
-            _BORDER_PAD_INNER,
-            _BORDER_PAD_INNER,
-            _BORDER_PAD_INNER,
-            _BORDER_PAD_INNER
-        )
+        # Lengths are scaled from a layout designed at IMAGE_WIDTH_LAYOUT
+        scale = self._layout_scale(image.size[0])
+        pad_inner = self._scaled(_BORDER_PAD_INNER, scale)
+        pad_outer_top = self._scaled(_BORDER_PAD_OUTER_TOP, scale)
+        pad_outer_sides_final = self._scaled(
+            _BORDER_PAD_OUTER_SIDES_FINAL, scale)
+
+        border_inner = (pad_inner, pad_inner, pad_inner, pad_inner)
 
         border_outer = (
-            _BORDER_PAD_OUTER_SIDES_INIT,
-            _BORDER_PAD_OUTER_TOP,
-            _BORDER_PAD_OUTER_SIDES_INIT,
+            self._scaled(_BORDER_PAD_OUTER_SIDES_INIT, scale),
+            pad_outer_top,
+            self._scaled(_BORDER_PAD_OUTER_SIDES_INIT, scale),
             0
         )
 
-        image = ImageOps.expand(image, border=border_inner, fill="black")
-        image = ImageOps.expand(image, border=border_inner, fill="white")
-        image = ImageOps.expand(image, border=border_outer, fill="black")
+        canvas = CanvasPlan(*image.size)
+        canvas.expand(border_inner, fill="black")
+        canvas.expand(border_inner, fill="white")
+        canvas.expand(border_outer, fill="black")
 
         is_title = text_title is not None and len(text_title) > 0
         is_subtitle = text_subtitle is not None and len(text_subtitle) > 0
 
+        draw_ops = []
+
         if (not is_title) and (not is_subtitle):
-            image = ImageOps.expand(
-                image,
-                border=(0, 0, 0, _BORDER_PAD_OUTER_TOP),
-                fill="black")
+            canvas.expand((0, 0, 0, pad_outer_top), fill="black")
         else:
+            # Text only grows the canvas downwards, so every line can be
+            # laid out first and drawn once at the end
             if is_title:
-                image = self._apply_title(image, title_lines, emoji_source,
-                                          is_subtitle)
+                draw_ops += self._layout_title(
+                    canvas, title_lines, is_subtitle, scale)
 
             if is_subtitle:
-                image = self._apply_subtitle(image, subtitle_lines,
-                                             emoji_source, is_title)
+                draw_ops += self._layout_subtitle(
+                    canvas, subtitle_lines, is_title, scale)
 
         # Final padding to ensure text gap
-        image = ImageOps.expand(
-            image,
-            border=(
-                _BORDER_PAD_OUTER_SIDES_FINAL, 0,
-                _BORDER_PAD_OUTER_SIDES_FINAL, 0
-            ),
+        canvas.expand(
+            (pad_outer_sides_final, 0, pad_outer_sides_final, 0),
             fill="black"
         )
 
+        draw_ops = [
+            op._replace(xy=(
+                op.xy[0] + pad_outer_sides_final,
+                op.xy[1]
+            ))
+            for op in draw_ops
+        ]
+
+        image = canvas.render(image)
+        self._draw_text(image, draw_ops, emoji_source)
+
         return image
 
-    def _apply_title(self, image, title_lines, emoji_source, is_subtitle):
-        image = ImageOps.expand(
-            image,
-            border=(0, 0, 0, _TITLE_PAD_ABOVE),
-            fill="black")
+    def _layout_title(self, canvas, title_lines, is_subtitle, scale):
+        canvas.expand(
+            (0, 0, 0, self._scaled(_TITLE_PAD_ABOVE, scale)), fill="black")
 
-        dt_width, dt_height = image.size
+        dt_width, dt_height = canvas.size
 
-        font = self._generate_font(
+        font = fit_font(
             text_lines=title_lines,
-            image=image,
+            width=dt_width * _TITLE_FONT_SCALE,
             font_path=self._path_font_title,
-            init_font_size=_TITLE_FONT_SIZE_INIT,
-            font_scale=_TITLE_FONT_SCALE,
-            emoji_scale_factor=_TITLE_EMOJI_SCALE)
+            init_font_size=self._scaled(_TITLE_FONT_SIZE_INIT, scale),
+            emoji_scale_factor=_TITLE_EMOJI_SCALE).font
 
         max_text_height = self._get_max_text_height(
             text_lines=title_lines, font=font)
 
         len_title_lines = len(title_lines)
-        title_bottom = int(len_title_lines * max_text_height * 0.9) + 5
+        title_bottom = (
+            int(len_title_lines * max_text_height * 0.9) +
+            self._scaled(_TITLE_PAD_BELOW, scale)
+        )
 
-        image = ImageOps.expand(
-            image, border=(0, 0, 0, title_bottom), fill="black")
+        canvas.expand((0, 0, 0, title_bottom), fill="black")
 
-        for i, text in enumerate(title_lines):
-            with Pilmoji(image, source=emoji_source) as pilmoji:
-                t_width, t_height = pilmoji.getsize(
-                    text=text,
-                    font=font,
-                    emoji_scale_factor=_TITLE_EMOJI_SCALE)
+        line_sizes = self._measure_lines(
+            text_lines=title_lines,
+            font=font,
+            emoji_scale_factor=_TITLE_EMOJI_SCALE)
+        draw_ops = []
 
+        for i, (text, (t_width, t_height)) in enumerate(
+                zip(title_lines, line_sizes)):
             x = int((dt_width - t_width) / 2)
             y = int(
                 dt_height +
@@ -140,49 +161,52 @@ class MemeFormatDemotiv(MemeFormat):
                 max_text_height * 0.5
             )
 
-            with Pilmoji(image, source=emoji_source) as pilmoji:
-                pilmoji.text(
-                    (x, y),
-                    text,
-                    fill=(255, 255, 255),
-                    font=font,
-                    emoji_scale_factor=_TITLE_EMOJI_SCALE,
-                    emoji_position_offset=_TITLE_EMOJI_POS_OFFSET)
+            draw_ops.append(DrawText(
+                xy=(x, y),
+                text=text,
+                font=font,
+                fill=(255, 255, 255),
+                emoji_scale_factor=_TITLE_EMOJI_SCALE,
+                emoji_position_offset=self._scaled(
+                    _TITLE_EMOJI_POS_OFFSET, scale)))
 
-        return image
+        return draw_ops
 
-    def _apply_subtitle(self, image, subtitle_lines, emoji_source, is_title):
+    def _layout_subtitle(self, canvas, subtitle_lines, is_title, scale):
         if not is_title:
-            image = ImageOps.expand(
-                image,
-                border=(0, 0, 0, _SUBTITLE_PAD_ABOVE_SOLO),
+            canvas.expand(
+                (0, 0, 0, self._scaled(_SUBTITLE_PAD_ABOVE_SOLO, scale)),
                 fill="black")
 
-        ds_width, ds_height = image.size
+        ds_width, ds_height = canvas.size
 
-        font = self._generate_font(
+        font = fit_font(
             text_lines=subtitle_lines,
-            image=image,
+            width=ds_width * _SUBTITLE_FONT_SCALE,
             font_path=self._path_font_subtitle,
-            init_font_size=_SUBTITLE_FONT_SIZE_INIT,
-            font_scale=_SUBTITLE_FONT_SCALE,
-            emoji_scale_factor=_SUBTITLE_EMOJI_SCALE)
+            init_font_size=self._scaled(_SUBTITLE_FONT_SIZE_INIT, scale),
+            emoji_scale_factor=_SUBTITLE_EMOJI_SCALE).font
 
-        max_text_height = self._get_max_text_height(
-            text_lines=subtitle_lines, font=font) + 5
+        max_text_height = (
+            self._get_max_text_height(text_lines=subtitle_lines, font=font) +
+            self._scaled(_SUBTITLE_LINE_SPACE, scale)
+        )
 
-        subtitle_bottom = len(subtitle_lines) * max_text_height + 5
+        subtitle_bottom = (
+            len(subtitle_lines) * max_text_height +
+            self._scaled(_SUBTITLE_PAD_END, scale)
+        )
 
-        image = ImageOps.expand(
-            image, border=(0, 0, 0, subtitle_bottom), fill="black")
+        canvas.expand((0, 0, 0, subtitle_bottom), fill="black")
 
-        for i, text in enumerate(subtitle_lines):
-            with Pilmoji(image, source=emoji_source) as pimoji:
-                t_width, t_height = pimoji.getsize(
-                    text=text,
-                    font=font,
-                    emoji_scale_factor=_SUBTITLE_EMOJI_SCALE)
+        line_sizes = self._measure_lines(
+            text_lines=subtitle_lines,
+            font=font,
+            emoji_scale_factor=_SUBTITLE_EMOJI_SCALE)
+        draw_ops = []
 
+        for i, (text, (t_width, t_height)) in enumerate(
+                zip(subtitle_lines, line_sizes)):
             x = int((ds_width - t_width) / 2)
 
             if is_title:
@@ -198,13 +222,13 @@ class MemeFormatDemotiv(MemeFormat):
                     max_text_height * 0.2
                 )
 
-            with Pilmoji(image, source=emoji_source) as pilmoji:
-                pilmoji.text(
-                    (x, y),
-                    text,
-                    fill=(255, 255, 255),
-                    font=font,
-                    emoji_scale_factor=_SUBTITLE_EMOJI_SCALE,
-                    emoji_position_offset=_SUBTITLE_EMOJI_POS_OFFSET)
+            draw_ops.append(DrawText(
+                xy=(x, y),
+                text=text,
+                font=font,
+                fill=(255, 255, 255),
+                emoji_scale_factor=_SUBTITLE_EMOJI_SCALE,
+                emoji_position_offset=self._scaled(
+                    _SUBTITLE_EMOJI_POS_OFFSET, scale)))
 
-        return image
+        return draw_ops
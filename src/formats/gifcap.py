@@ -1,10 +1,11 @@
 # Copyright (c) 2021-2025 r3w0p
 # The following code can be redistributed and/or
 # modified under the terms of the GPL-3.0 License.
-from PIL import ImageFile, ImageOps
-from pilmoji import Pilmoji
+from typing import List, Tuple
 
-from src.formats import MemeFormat
+from PIL import ImageFile
+
+from src.formats import CanvasPlan, DrawText, MemeFormat
 
 _WORD_WRAP = 25
 _INIT_FONT_SIZE = 80
@@ -22,6 +23,9 @@ class MemeFormatGifcap(MemeFormat):
 
         self._path_font = path_font
 
+    def fonts(self) -> List[Tuple[str, int]]:
+        return [(self._path_font, _INIT_FONT_SIZE)]
+
     def apply(
             self,
             image: ImageFile,
@@ -31,47 +35,54 @@ class MemeFormatGifcap(MemeFormat):
     ) -> ImageFile:
         text_lines = self._wrap_new_lines(text, _WORD_WRAP)
 
+        # Lengths are scaled from a layout designed at IMAGE_WIDTH_LAYOUT
+        scale = self._layout_scale(image.size[0])
+        text_space = self._scaled(_TEXT_SPACE, scale)
+        height_pad = self._scaled(_HEIGHT_PAD, scale)
+        emoji_pos_offset = self._scaled(_EMOJI_POS_OFFSET, scale)
+
         font = self._generate_font(
             text_lines=text_lines,
             image=image,
             font_path=self._path_font,
-            init_font_size=_INIT_FONT_SIZE,
+            init_font_size=self._scaled(_INIT_FONT_SIZE, scale),
             font_scale=_MAX_FONT)
 
         max_text_height = self._get_max_text_height(
             text_lines=text_lines, font=font)
 
         top = int(
-            _HEIGHT_PAD * 2 +
+            height_pad * 2 +
             max_text_height * len(text_lines) +
-            _TEXT_SPACE * len(text_lines)
+            text_space * len(text_lines)
         )
 
-        border = (0, top, 0, 0)
-        image = ImageOps.expand(image, border=border, fill='white')
+        canvas = CanvasPlan(*image.size)
+        canvas.expand((0, top, 0, 0), fill='white')
+        image = canvas.render(image)
 
         i_width, i_height = image.size
 
-        for i, text in enumerate(text_lines):
-            with Pilmoji(image, source=emoji_source) as pilmoji:
-                t_width, t_height = pilmoji.getsize(
-                    text=text,
-                    font=font,
-                    emoji_scale_factor=_EMOJI_SCALE)
+        line_sizes = self._measure_lines(
+            text_lines=text_lines, font=font, emoji_scale_factor=_EMOJI_SCALE)
+        draw_ops = []
 
+        for i, (text, (t_width, t_height)) in enumerate(
+                zip(text_lines, line_sizes)):
             x = int((i_width - t_width) / 2)
             y = int(
-                _HEIGHT_PAD * 0.7 +
-                i * (max_text_height + _TEXT_SPACE)
+                height_pad * 0.7 +
+                i * (max_text_height + text_space)
             )
 
-            with Pilmoji(image, source=emoji_source) as pilmoji:
-                pilmoji.text(
-                    (x, y),
-                    text,
-                    fill=(0, 0, 0),
-                    font=font,
-                    emoji_scale_factor=_EMOJI_SCALE,
-                    emoji_position_offset=_EMOJI_POS_OFFSET)
+            draw_ops.append(DrawText(
+                xy=(x, y),
+                text=text,
+                font=font,
+                fill=(0, 0, 0),
+                emoji_scale_factor=_EMOJI_SCALE,
+                emoji_position_offset=emoji_pos_offset))
+
+        self._draw_text(image, draw_ops, emoji_source)
 
         return image
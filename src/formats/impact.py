@@ -2,16 +2,18 @@
 # The following code can be redistributed and/or
 # modified under the terms of the GPL-3.0 License.
 
+from typing import List, Tuple
+
 from PIL import ImageFile
-from pilmoji import Pilmoji
 
 from src.constants import DELIM_CONTEXT
-from src.formats import MemeFormat
+from src.formats import DrawText, MemeFormat
 
 _WORD_WRAP = 25
 _INIT_FONT_SIZE = 50
 _MAX_FONT = 0.94
 _STROKE_WIDTH = 3
+_PAD_TOP = -4
 _PAD_BOTTOM = 13
 _EMOJI_SCALE = 0.9
 _EMOJI_POS_OFFSET = (0, 15)
@@ -24,6 +26,9 @@ class MemeFormatImpact(MemeFormat):
 
         self._path_font = path_font
 
+    def fonts(self) -> List[Tuple[str, int]]:
+        return [(self._path_font, _INIT_FONT_SIZE)]
+
     def apply(
             self,
             image: ImageFile,
@@ -40,6 +45,14 @@ class MemeFormatImpact(MemeFormat):
 
         i_width, i_height = image.size
 
+        # Lengths are scaled from a layout designed at IMAGE_WIDTH_LAYOUT
+        scale = self._layout_scale(i_width)
+        init_font_size = self._scaled(_INIT_FONT_SIZE, scale)
+        stroke_width = self._scaled(_STROKE_WIDTH, scale)
+        pad_top = self._scaled(_PAD_TOP, scale)
+        pad_bottom = self._scaled(_PAD_BOTTOM, scale)
+        emoji_pos_offset = self._scaled(_EMOJI_POS_OFFSET, scale)
+
         # Top position
         top_lines = self._wrap_new_lines(text_top.upper(), _WORD_WRAP)
         bottom_lines = self._wrap_new_lines(text_bottom.upper(), _WORD_WRAP)
@@ -48,7 +61,7 @@ class MemeFormatImpact(MemeFormat):
             text_lines=top_lines,
             image=image,
             font_path=self._path_font,
-            init_font_size=_INIT_FONT_SIZE,
+            init_font_size=init_font_size,
             font_scale=_MAX_FONT,
             emoji_scale_factor=_EMOJI_SCALE)
 
@@ -56,7 +69,7 @@ class MemeFormatImpact(MemeFormat):
             text_lines=bottom_lines,
             image=image,
             font_path=self._path_font,
-            init_font_size=_INIT_FONT_SIZE,
+            init_font_size=init_font_size,
             font_scale=_MAX_FONT,
             emoji_scale_factor=_EMOJI_SCALE)
 
@@ -66,37 +79,38 @@ class MemeFormatImpact(MemeFormat):
         bottom_max_height = self._get_max_text_height(
             text_lines=bottom_lines, font=bottom_font)
 
+        draw_ops = []
+
         for lines, font, pos_top in [
             (top_lines, top_font, True),
             (bottom_lines, bottom_font, False)
         ]:
-            for i, text in enumerate(lines):
-                with Pilmoji(image, source=emoji_source) as pilmoji:
-                    t_width, t_height = pilmoji.getsize(
-                        text=text,
-                        font=font,
-                        emoji_scale_factor=_EMOJI_SCALE)
+            line_sizes = self._measure_lines(
+                text_lines=lines, font=font, emoji_scale_factor=_EMOJI_SCALE)
 
+            for i, (text, (t_width, t_height)) in enumerate(
+                    zip(lines, line_sizes)):
                 x = int((i_width - t_width) / 2)
 
                 if pos_top:
-                    y = int(i * top_max_height - 4)
+                    y = int(i * top_max_height + pad_top)
                 else:
                     y = int(
                         i_height -
-                        _PAD_BOTTOM -
+                        pad_bottom -
                         ((len(lines) - i) * bottom_max_height)
                     )
 
-                with Pilmoji(image, source=emoji_source) as pilmoji:
-                    pilmoji.text(
-                        (x, y),
-                        text,
-                        fill=(255, 255, 255),
-                        font=font,
-                        stroke_width=_STROKE_WIDTH,
-                        stroke_fill=(0, 0, 0),
-                        emoji_scale_factor=_EMOJI_SCALE,
-                        emoji_position_offset=_EMOJI_POS_OFFSET)
+                draw_ops.append(DrawText(
+                    xy=(x, y),
+                    text=text,
+                    font=font,
+                    fill=(255, 255, 255),
+                    stroke_width=stroke_width,
+                    stroke_fill=(0, 0, 0),
+                    emoji_scale_factor=_EMOJI_SCALE,
+                    emoji_position_offset=emoji_pos_offset))
+
+        self._draw_text(image, draw_ops, emoji_source)
 
         return image
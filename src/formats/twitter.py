@@ -1,19 +1,20 @@
 # Copyright (c) 2021-2025 r3w0p
 # The following code can be redistributed and/or
 # modified under the terms of the GPL-3.0 License.
+from functools import lru_cache
+from typing import List, Tuple
 
-from PIL import ImageFile, Image, ImageDraw, ImageOps
-from pilmoji import Pilmoji
+from PIL import ImageFile, Image, ImageDraw
 
-from src.formats import MemeFormat
+from src.formats import CanvasPlan, DrawText, MemeFormat
 
 _WORD_WRAP = 24
 _INIT_FONT_SIZE = 42
 _MAX_FONT = 0.94
 _PAD_SPACE = 15
 _PAD_MULTILINE = 10
-_RADIUS = 60
-_RADIUS_MULTIPLY = 3
+_RADIUS = 20
+_RADIUS_SUPERSAMPLE = 3
 _EMOJI_POS_OFFSET = (0, 3)
 
 
@@ -24,6 +25,9 @@ class MemeFormatTwitter(MemeFormat):
 
         self._path_font = path_font
 
+    def fonts(self) -> List[Tuple[str, int]]:
+        return [(self._path_font, _INIT_FONT_SIZE)]
+
     def apply(
             self,
             image: ImageFile,
@@ -36,87 +40,104 @@ class MemeFormatTwitter(MemeFormat):
 
         text_lines = self._wrap_new_lines(text, _WORD_WRAP)
 
+        # Lengths are scaled from a layout designed at IMAGE_WIDTH_LAYOUT
+        scale = self._layout_scale(image.size[0])
+        pad_space = self._scaled(_PAD_SPACE, scale)
+        pad_multiline = self._scaled(_PAD_MULTILINE, scale)
+        radius = self._scaled(_RADIUS, scale)
+        emoji_pos_offset = self._scaled(_EMOJI_POS_OFFSET, scale)
+
         font = self._generate_font(
             text_lines=text_lines,
             image=image,
             font_path=self._path_font,
-            init_font_size=_INIT_FONT_SIZE,
+            init_font_size=self._scaled(_INIT_FONT_SIZE, scale),
             font_scale=_MAX_FONT)
 
         max_text_height = self._get_max_text_height(
             text_lines=text_lines, font=font)
 
-        image = self._add_corners(image, _RADIUS, fill_bg)
+        # Corners are blended with the background colour, which needs true
+        # colour; alpha is kept so that animation overlays can be rendered
+        if image.mode not in ["RGB", "RGBA"]:
+            image = image.convert("RGB")
 
         pad_space_top = int(
-            _PAD_SPACE * 2 +
-            len(text_lines) * (max_text_height + _PAD_MULTILINE)
+            pad_space * 2 +
+            len(text_lines) * (max_text_height + pad_multiline)
         )
-        border = (_PAD_SPACE, pad_space_top, _PAD_SPACE, _PAD_SPACE)
+        border = (pad_space, pad_space_top, pad_space, pad_space)
+
+        canvas = CanvasPlan(*image.size)
+        canvas.expand(border, fill=fill_bg)
+        source_box = canvas.source_xy + image.size
+        image = canvas.render(image)
+
+        self._add_corners(image, source_box, radius, fill_bg)
 
-        image = ImageOps.expand(image, border=border, fill=fill_bg)
+        draw_ops = []
 
         for i, text in enumerate(text_lines):
-            x = _PAD_SPACE
+            x = pad_space
             y = int(
-                _PAD_SPACE +
-                i * (max_text_height + _PAD_MULTILINE)
+                pad_space +
+                i * (max_text_height + pad_multiline)
             )
 
-            with Pilmoji(image, source=emoji_source) as pilmoji:
-                pilmoji.text(
-                    (x, y),
-                    text,
-                    fill=fill_txt,
-                    font=font,
-                    emoji_position_offset=_EMOJI_POS_OFFSET)
+            draw_ops.append(DrawText(
+                xy=(x, y),
+                text=text,
+                font=font,
+                fill=fill_txt,
+                emoji_position_offset=emoji_pos_offset))
+
+        self._draw_text(image, draw_ops, emoji_source)
 
         return image
 
     @staticmethod
-    def _add_corners(image, radius, fill_bg):
-        # Adapted from: https://stackoverflow.com/a/11291419
-
-        # Temporarily double image size so that corners appear smoother
-        # when returned back to its original size
-        w_orig, h_orig = image.size
-        image = image.resize((
-            w_orig * _RADIUS_MULTIPLY,
-            h_orig * _RADIUS_MULTIPLY
-        ))
-        w, h = image.size
-
-        # Add corners
-        image_circle = Image.new(
-            mode='L',
-            size=(radius * 2, radius * 2),
-            color="black"
-        )
-        draw = ImageDraw.Draw(image_circle)
-        draw.ellipse((0, 0, radius * 2, radius * 2), fill="white")
-
-        alpha = Image.new('L', image.size, color="white")
-        alpha.paste(image_circle.crop(
-            (0, 0, radius, radius)), (0, 0)
-        )
-        alpha.paste(image_circle.crop(
-            (0, radius, radius, radius * 2)), (0, h - radius)
-        )
-        alpha.paste(image_circle.crop(
-            (radius, 0, radius * 2, radius)), (w - radius, 0)
-        )
-        alpha.paste(image_circle.crop(
-            (radius, radius, radius * 2, radius * 2)),
-            (w - radius, h - radius)
-        )
-        image.putalpha(alpha)
-
-        # Fill transparent corners
-        image_fill = Image.new("RGBA", image.size, color=fill_bg)
-        image_fill.paste(image, (0, 0), image)
-        image = image_fill.convert('RGB')
-
-        # Resize to original dimensions
-        image = image.resize((w_orig, h_orig))
-
-        return image
+    def _add_corners(image, box, radius, fill_bg) -> None:
+        # Blends the background colour into the four corners of the box,
+        # in place, touching only the corner regions
+        x, y, w, h = box
+        fill, masks = _corner_masks(radius, fill_bg)
+
+        for mask, xy in zip(masks, [
+            (x, y),
+            (x + w - radius, y),
+            (x, y + h - radius),
+            (x + w - radius, y + h - radius)
+        ]):
+            if image.mode == "RGBA":
+                # Pasting would blend the colour with transparency too
+                tile = fill.convert("RGBA")
+                tile.putalpha(mask)
+                image.alpha_composite(tile, xy)
+            else:
+                image.paste(fill, xy, mask)
+
+
+@lru_cache(maxsize=64)
+def _corner_masks(radius, fill_bg):
+    """Builds a background tile and anti-aliased masks for the top-left,
+    top-right, bottom-left and bottom-right corners.
+
+    The circle is drawn at _RADIUS_SUPERSAMPLE times the size and
+    downsampled, so corners stay smooth at native resolution.
+    """
+    size = radius * 2 * _RADIUS_SUPERSAMPLE
+
+    circle = Image.new(mode="L", size=(size, size), color="white")
+    draw = ImageDraw.Draw(circle)
+    draw.ellipse((0, 0, size, size), fill="black")
+    circle = circle.resize((radius * 2, radius * 2), Image.LANCZOS)
+
+    masks = (
+        circle.crop((0, 0, radius, radius)),
+        circle.crop((radius, 0, radius * 2, radius)),
+        circle.crop((0, radius, radius, radius * 2)),
+        circle.crop((radius, radius, radius * 2, radius * 2))
+    )
+    fill = Image.new("RGB", (radius, radius), color=fill_bg)
+
+    return fill, masks
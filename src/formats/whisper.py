@@ -2,10 +2,11 @@
 # The following code can be redistributed and/or
 # modified under the terms of the GPL-3.0 License.
 
+from typing import List, Tuple
+
 from PIL import ImageFile
-from pilmoji import Pilmoji
 
-from src.formats import MemeFormat
+from src.formats import DrawText, MemeFormat
 
 _WORD_WRAP = 15
 _INIT_FONT_SIZE = 92
@@ -13,6 +14,7 @@ _MAX_FONT = 1.0
 _STROKE_WIDTH = 4
 _HEIGHT_PAD = 200
 _TEXT_SPACE = 5
+_LINE_RAISE = 50
 _EMOJI_SCALE = 0.75
 _EMOJI_POS_OFFSET = (0, 6)
 
@@ -24,6 +26,9 @@ class MemeFormatWhisper(MemeFormat):
 
         self._path_font = path_font
 
+    def fonts(self) -> List[Tuple[str, int]]:
+        return [(self._path_font, _INIT_FONT_SIZE)]
+
     def apply(
             self,
             image: ImageFile,
@@ -33,11 +38,18 @@ class MemeFormatWhisper(MemeFormat):
     ) -> ImageFile:
         text_lines = self._wrap_new_lines(text, _WORD_WRAP)
 
+        # Lengths are scaled from a layout designed at IMAGE_WIDTH_LAYOUT
+        scale = self._layout_scale(image.size[0])
+        stroke_width = self._scaled(_STROKE_WIDTH, scale)
+        text_space = self._scaled(_TEXT_SPACE, scale)
+        line_raise = self._scaled(_LINE_RAISE, scale)
+        emoji_pos_offset = self._scaled(_EMOJI_POS_OFFSET, scale)
+
         font = self._generate_font(
             text_lines=text_lines,
             image=image,
             font_path=self._path_font,
-            init_font_size=_INIT_FONT_SIZE,
+            init_font_size=self._scaled(_INIT_FONT_SIZE, scale),
             font_scale=_MAX_FONT)
 
         max_text_height = self._get_max_text_height(
@@ -48,30 +60,29 @@ class MemeFormatWhisper(MemeFormat):
         i_width, i_height = image.size
         len_text_lines = len(text_lines)
 
-        for i, text in enumerate(text_lines):
-            with Pilmoji(image, source=emoji_source) as pilmoji:
-                t_width, t_height = pilmoji.getsize(
-                    text=text,
-                    font=font,
-                    emoji_scale_factor=_EMOJI_SCALE)
+        line_sizes = self._measure_lines(
+            text_lines=text_lines, font=font, emoji_scale_factor=_EMOJI_SCALE)
+        draw_ops = []
 
+        for i, (text, (t_width, t_height)) in enumerate(
+                zip(text_lines, line_sizes)):
             x = int((i_width - t_width) / 2)
             y = int(
                 (i_height - t_height) * 0.52 +
-                i * (max_text_height + _TEXT_SPACE) -
-                (len_text_lines - 1) * 50
+                i * (max_text_height + text_space) -
+                (len_text_lines - 1) * line_raise
             )
 
-            with Pilmoji(image, source=emoji_source) as pilmoji:
-                pilmoji.text(
-                    (x, y),
-                    text,
-                    fill=(255, 255, 255),
-                    font=font,
-                    stroke_width=_STROKE_WIDTH,
-                    stroke_fill=(0, 0, 0),
-                    emoji_scale_factor=_EMOJI_SCALE,
-                    emoji_position_offset=_EMOJI_POS_OFFSET
-                )
+            draw_ops.append(DrawText(
+                xy=(x, y),
+                text=text,
+                font=font,
+                fill=(255, 255, 255),
+                stroke_width=stroke_width,
+                stroke_fill=(0, 0, 0),
+                emoji_scale_factor=_EMOJI_SCALE,
+                emoji_position_offset=emoji_pos_offset))
+
+        self._draw_text(image, draw_ops, emoji_source)
 
         return image
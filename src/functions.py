@@ -2,19 +2,21 @@
 # The following code can be redistributed and/or
 # modified under the terms of the GPL-3.0 License.
 from glob import glob
+from io import BytesIO
 from math import floor
-from os.path import splitext
-from re import split as re_split
-from typing import Dict
-from urllib.parse import urlparse
+from typing import Dict, Optional, Tuple
 
-import requests
+import aiohttp
 from PIL import Image
 from pilmoji.source import EmojiCDNSource, AppleEmojiSource, GoogleEmojiSource, \
     FacebookEmojiSource, TwitterEmojiSource
 
+from src.commands import *
 from src.constants import *
+from src.emoji_cache import CachedEmojiSource
 from src.exceptions import MinorMemeoffError, MajorMemeoffError
+from src.header import *
+from src.stages import stage
 from src.formats import *
 from src.formats.demotiv import MemeFormatDemotiv
 from src.formats.gifcap import MemeFormatGifcap
@@ -25,6 +27,8 @@ from src.formats.whisper import MemeFormatWhisper
 _EXC_FONT_NOT_FOUND: str = "Font not found: %s"
 _EXC_FONT_MULTIPLE: str = "Multiple fonts found: %s"
 
+_http_session: Optional[aiohttp.ClientSession] = None
+
 
 def process_content(
         image,
@@ -32,70 +36,34 @@ def process_content(
         formats,
         emoji_source
 ):
-    # Remove variant selectors
-    # FE0E: emoji to be presented as text
-    content = content.replace(u"\uFE0E", "")
-    # FE0F: emoji to be presented as an image (color, animation)
-    content = content.replace(u"\uFE0F", "")
-    # 2642: male variant
-    content = content.replace(u"\u2642", "")
-    # 2640: female variant
-    content = content.replace(u"\u2640", "")
-    # 200D: zero-width joiner, joins emoji into a single glyph
-    content = content.replace(u"\u200D", "")
-
-    # Remove spoiler marks at start and end, if they exist
-    if (
-            content.startswith(DELIM_SPOILER) and
-            content.endswith(DELIM_SPOILER)
-    ):
-        content = content[len(DELIM_SPOILER):][:-len(DELIM_SPOILER)]
-
-    # Options
-    dark: bool = COMMAND_DARK in content
-
-    content_split: List[str] = [
-        x.strip() for x in re_split(REGEX_PATTERN_SLASH, content)
-        if x is not None and len(x.strip()) > 0
-    ]
-    len_content_split: int = len(content_split)
-
-    i: int = 0
-    # if first split is not a slash string, skip it
-    if not is_memeoff_command(content_split[i]):
-        i += 1
-
-    # Parse and apply format requests
-    while i < len_content_split:
-        slash: str = content_split[i]
-        text: str = (
-            content_split[i + 1] if (
-                    i + 1 < len_content_split and
-                    not is_memeoff_command(content_split[i + 1])
-            ) else ""
-        )
-
-        i += 1 if len(text) == 0 else 2
-
-        if slash == COMMAND_DEMOTIV:
-            image = formats[NAME_DEMOTIV].apply(image, text, emoji_source)
-
-        elif slash == COMMAND_GIFCAP:
-            image = formats[NAME_GIFCAP].apply(image, text, emoji_source)
-
-        elif slash == COMMAND_IMPACT:
-            image = formats[NAME_IMPACT].apply(image, text, emoji_source)
-
-        elif slash == COMMAND_TWITTER:
-            image = formats[NAME_TWITTER].apply(
-                image=image,
-                text=text,
-                emoji_source=emoji_source,
-                dark=dark
-            )
-
-        elif slash == COMMAND_WHISPER:
-            image = formats[NAME_WHISPER].apply(image, text, emoji_source)
+    plan = parse_content(content)
+
+    # Apply format requests
+    for command, text in plan.formats:
+        with stage(f"{STAGE_APPLY}_{command[1:]}"):
+            if command == COMMAND_DEMOTIV:
+                image = formats[NAME_DEMOTIV].apply(
+                    image, text, emoji_source)
+
+            elif command == COMMAND_GIFCAP:
+                image = formats[NAME_GIFCAP].apply(
+                    image, text, emoji_source)
+
+            elif command == COMMAND_IMPACT:
+                image = formats[NAME_IMPACT].apply(
+                    image, text, emoji_source)
+
+            elif command == COMMAND_TWITTER:
+                image = formats[NAME_TWITTER].apply(
+                    image=image,
+                    text=text,
+                    emoji_source=emoji_source,
+                    dark=plan.dark
+                )
+
+            elif command == COMMAND_WHISPER:
+                image = formats[NAME_WHISPER].apply(
+                    image, text, emoji_source)
 
     return image
 
@@ -118,6 +86,40 @@ def emoji_style_to_pilmoji_source_class(
     raise MajorMemeoffError(f"Invalid emoji style: {style}")
 
 
+def get_emoji_source(style: str, cache: bool = True):
+    source_class = emoji_style_to_pilmoji_source_class(style)
+
+    if not cache:
+        return source_class
+
+    return CachedEmojiSource(
+        source_class=source_class,
+        path=PATH_EMOJI / style
+    )
+
+
+def resample_filter_from_name(name: str) -> Image.Resampling:
+    if name == RESAMPLE_NEAREST:
+        return Image.Resampling.NEAREST
+
+    if name == RESAMPLE_BOX:
+        return Image.Resampling.BOX
+
+    if name == RESAMPLE_BILINEAR:
+        return Image.Resampling.BILINEAR
+
+    if name == RESAMPLE_HAMMING:
+        return Image.Resampling.HAMMING
+
+    if name == RESAMPLE_BICUBIC:
+        return Image.Resampling.BICUBIC
+
+    if name == RESAMPLE_LANCZOS:
+        return Image.Resampling.LANCZOS
+
+    raise MajorMemeoffError(f"Invalid resample filter: {name}")
+
+
 def message_has_image_reference(message) -> bool:
     # Attachment
     if len(message.attachments) > 0:
@@ -126,57 +128,112 @@ def message_has_image_reference(message) -> bool:
     # Reply Attachment
     if (
             message.reference is not None and
-            message.reference.resolved is not None and
-            len(message.reference.resolved.attachments) > 0
+            len(getattr(message.reference.resolved, "attachments", [])) > 0
     ):
         return True
 
     return False
 
 
-async def download_image_from_message(message):
+def image_url_from_message(message) -> str:
     # Attachment
     if len(message.attachments) > 0:
-        return download_image(message.attachments[0].url)
+        return message.attachments[0].url
 
     # Reply Attachment
     else:
-        return download_image(
-            message.reference.resolved.attachments[0].url
-        )
+        return message.reference.resolved.attachments[0].url
+
 
+def image_size_from_message(message) -> Optional[Tuple[int, int]]:
+    # As Discord reports it, if it does, before the image is downloaded
+    if len(message.attachments) > 0:
+        attachment = message.attachments[0]
+    else:
+        attachment = message.reference.resolved.attachments[0]
+
+    width = getattr(attachment, "width", None)
+    height = getattr(attachment, "height", None)
+
+    if not width or not height:
+        return None
 
-def reshape_image(image):
+    return width, height
+
+
+def reshape_image(
+        image,
+        resample_down: str = IMAGE_RESAMPLE_DOWN,
+        resample_up: str = IMAGE_RESAMPLE_UP
+):
     # Check whether image is too small
     # if IMAGE_WIDTH_MIN > 0 and image.size[0] < IMAGE_WIDTH_MIN:
     #    raise MinorMemeoffError(
     #        f"Cannot use image from {image_url}: "
     #        f"width is less than {IMAGE_WIDTH_MIN}px.")
 
-    # Check whether image meets the enforced width, and resize if not
-    if image.size[0] > IMAGE_WIDTH_FORCE:
-        reduction = (image.size[0] - IMAGE_WIDTH_FORCE) / image.size[0]
+    # Images keep their own width, and so are resampled at most once, unless
+    # it is outside the range they are rendered at
+    size = None
+    resample = None
+    width = min(max(image.size[0], IMAGE_WIDTH_MIN), IMAGE_WIDTH_MAX)
+
+    if image.size[0] > width:
+        reduction = (image.size[0] - width) / image.size[0]
         height_reduced = floor(image.size[1] * (1 - reduction))
+        size = (width, max(1, height_reduced))
+        resample = resample_filter_from_name(resample_down)
 
-        image = image.resize((IMAGE_WIDTH_FORCE, height_reduced))
+        # JPEG can decode straight to 1/2, 1/4 or 1/8 scale if not yet loaded
+        if image.format == FILE_TYPE_JPEG:
+            image.draft(image.mode, _reducing_gap_size(size))
 
-    elif image.size[0] < IMAGE_WIDTH_FORCE:
-        increase = IMAGE_WIDTH_FORCE / image.size[0]
+    elif image.size[0] < width:
+        increase = width / image.size[0]
         height_increased = floor(image.size[1] * increase)
+        size = (width, height_increased)
+        resample = resample_filter_from_name(resample_up)
+
+    with stage(STAGE_DECODE):
+        image.load()
 
-        image = image.resize((IMAGE_WIDTH_FORCE, height_increased))
+    if size is None:
+        return image
+
+    with stage(STAGE_RESHAPE):
+        if image.size[0] > size[0]:
+            image = _reduce_image(image, size)
+
+        image = image.resize(size, resample)
 
     return image
 
 
-def image_ftype_from_url(image_url) -> str:
-    image_ftype = splitext(urlparse(image_url).path)[1][1:].upper()
+def _reducing_gap_size(size):
+    return (
+        max(1, int(size[0] * IMAGE_REDUCING_GAP)),
+        max(1, int(size[1] * IMAGE_REDUCING_GAP))
+    )
+
 
-    # PIL cannot handle "JPG"
-    if image_ftype == FILE_TYPE_JPG:
-        image_ftype = FILE_TYPE_JPEG
+def _reduce_image(image, size):
+    # Cheaply shrinks an image to no less than IMAGE_REDUCING_GAP times
+    # `size`, so that the final resample has fewer pixels to read
 
-    return image_ftype
+    # Nearest-neighbour modes are resampled without averaging in Pillow
+    if image.mode in ["1", "P"]:
+        return image
+
+    size_gap = _reducing_gap_size(size)
+    factor = min(
+        image.size[0] // size_gap[0],
+        image.size[1] // size_gap[1]
+    )
+
+    if factor >= 2:
+        image = image.reduce(factor)
+
+    return image
 
 
 def image_ftype_from_path(image_path: Path) -> str:
@@ -189,33 +246,226 @@ def image_ftype_from_path(image_path: Path) -> str:
     return image_ftype
 
 
-def download_image(image_url):
+def get_http_session() -> aiohttp.ClientSession:
+    # One pooled, keep-alive session shared by every download; must be
+    # called from within the running event loop
+    global _http_session
+
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=DOWNLOAD_POOL_SIZE,
+                limit_per_host=DOWNLOAD_POOL_SIZE_PER_HOST,
+                keepalive_timeout=DOWNLOAD_KEEPALIVE_TIMEOUT
+            ),
+            timeout=aiohttp.ClientTimeout(
+                total=DOWNLOAD_TIMEOUT_TOTAL,
+                connect=DOWNLOAD_TIMEOUT_CONNECT,
+                sock_read=DOWNLOAD_TIMEOUT_READ
+            )
+        )
+
+    return _http_session
+
+
+async def close_http_session() -> None:
+    global _http_session
+
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+
+    _http_session = None
+
+
+async def download_bytes(
+        url: str,
+        max_bytes: int = DOWNLOAD_MAX_BYTES,
+        inspect: bool = False
+) -> bytes:
+    session = get_http_session()
+
+    async with session.get(url) as response:
+        response.raise_for_status()
+
+        # Reject early if the server already tells us it is too big
+        if (
+                response.content_length is not None and
+                response.content_length > max_bytes
+        ):
+            raise MinorMemeoffError(
+                f"Image at {url} exceeds {max_bytes} bytes.")
+
+        return await read_stream(
+            response.content, max_bytes, f"Image at {url}", inspect)
+
+
+async def read_stream(
+        stream,
+        max_bytes: int,
+        name: str,
+        inspect: bool = False
+) -> bytes:
+    # Reads an aiohttp stream, giving up as soon as it is too big or, if
+    # `inspect` is set, as soon as its image header shows it is unusable
+    header = ImageHeader(name) if inspect else None
+    header_done = not inspect
+    data = bytearray()
+
+    async for chunk in stream.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+        if len(data) + len(chunk) > max_bytes:
+            raise MinorMemeoffError(f"{name} exceeds {max_bytes} bytes.")
+
+        data += chunk
+
+        # Only the start of the image, which the header is read within
+        if not header_done:
+            header_done = header.feed(bytes(data[:IMAGE_HEADER_MAX_BYTES]))
+
+    data = bytes(data)
+
+    if header is not None:
+        header.close(data)
+
+    return data
+
+
+async def download_image_bytes(image_url) -> bytes:
     try:
-        image_response = requests.get(image_url, stream=True).raw
+        with stage(STAGE_DOWNLOAD):
+            return await download_bytes(image_url, inspect=True)
+
+    except MinorMemeoffError:
+        raise
 
     except Exception as e:
         raise MinorMemeoffError(
             f"Failed to download image at {image_url}: {e}")
 
+
+def read_image(image_bytes: bytes, image_url):
     try:
-        image = Image.open(image_response)
+        image = Image.open(BytesIO(image_bytes))
 
     except Exception as e:
         raise MinorMemeoffError(
             f"Failed to open image from {image_url}: {e}")
 
-    image = reshape_image(image)
-    image_ftype = image_ftype_from_url(image_url)
+    check_image_size(image.size, f"Image from {image_url}")
+
+    return image
+
 
-    return image, image_ftype
+def open_image(
+        image_bytes: bytes,
+        image_url,
+        resample_down: str = IMAGE_RESAMPLE_DOWN,
+        resample_up: str = IMAGE_RESAMPLE_UP
+):
+    return reshape_image(
+        read_image(image_bytes, image_url),
+        resample_down=resample_down,
+        resample_up=resample_up
+    )
 
 
-def contains_memeoff_format(s: str) -> bool:
-    return any(slash in s for slash in COMMANDS_FORMATS)
+def encode_image(image, image_ftype: str, quality: int = None) -> bytes:
+    with stage(STAGE_ENCODE):
+        return _encode_image(image, image_ftype, quality)
 
 
-def is_memeoff_command(s: str) -> bool:
-    return any(s == slash for slash in COMMANDS_ALL)
+def encode_image_to_budget(
+        image,
+        image_ftype: str,
+        max_bytes: int = ENCODE_MAX_BYTES
+) -> Tuple[bytes, str]:
+    """Encodes an image in at most `max_bytes` (0 for no limit).
+
+    Returns the encoded bytes and their file type, which becomes lossy if a
+    lossless encoding is too large. Lossy encodings lower their quality,
+    and then the image is downscaled, until the result fits.
+    """
+    with stage(STAGE_ENCODE):
+        image_bytes = _encode_image(image, image_ftype)
+
+        if max_bytes <= 0 or len(image_bytes) <= max_bytes:
+            return image_bytes, image_ftype
+
+        if image_ftype not in [FILE_TYPE_JPEG, FILE_TYPE_WEBP]:
+            image_ftype = (
+                FILE_TYPE_WEBP if _has_alpha(image) else FILE_TYPE_JPEG
+            )
+
+        while True:
+            image_bytes = _encode_image_quality_search(
+                image, image_ftype, max_bytes)
+
+            if image_bytes is not None:
+                return image_bytes, image_ftype
+
+            if image.size[0] * ENCODE_DOWNSCALE < IMAGE_WIDTH_MIN:
+                raise MinorMemeoffError(
+                    f"Image cannot be encoded in {max_bytes} bytes.")
+
+            image = image.resize((
+                floor(image.size[0] * ENCODE_DOWNSCALE),
+                floor(image.size[1] * ENCODE_DOWNSCALE)
+            ))
+
+
+def _encode_image_quality_search(image, image_ftype: str, max_bytes: int):
+    # Highest quality whose encoding fits, or None if none does
+    low = ENCODE_QUALITY_MIN
+    high = (
+        ENCODE_QUALITY_JPEG if image_ftype == FILE_TYPE_JPEG
+        else ENCODE_QUALITY_WEBP
+    )
+
+    best = _encode_image(image, image_ftype, low)
+
+    if len(best) > max_bytes:
+        return None
+
+    while low < high:
+        mid = (low + high + 1) // 2
+        image_bytes = _encode_image(image, image_ftype, mid)
+
+        if len(image_bytes) <= max_bytes:
+            low, best = mid, image_bytes
+        else:
+            high = mid - 1
+
+    return best
+
+
+def _encode_image(image, image_ftype: str, quality: int = None) -> bytes:
+    if image_ftype == FILE_TYPE_JPEG:
+        params = {
+            "quality": quality or ENCODE_QUALITY_JPEG,
+            "optimize": True
+        }
+
+        if image.mode not in ["RGB", "L", "CMYK"]:
+            image = image.convert("RGB")
+
+    elif image_ftype == FILE_TYPE_WEBP:
+        params = {"quality": quality or ENCODE_QUALITY_WEBP}
+
+    elif image_ftype == FILE_TYPE_PNG:
+        params = {"compress_level": ENCODE_PNG_COMPRESS_LEVEL}
+
+    else:
+        params = {}
+
+    with BytesIO() as image_binary:
+        image.save(image_binary, image_ftype, **params)
+        return image_binary.getvalue()
+
+
+def _has_alpha(image) -> bool:
+    return (
+        image.mode in ["RGBA", "LA", "PA"] or
+        "transparency" in image.info
+    )
 
 
 def get_formats() -> Dict[str, MemeFormat]:
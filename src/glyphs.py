@@ -0,0 +1,140 @@
+# Copyright (c) 2021-2025 r3w0p
+# The following code can be redistributed and/or
+# modified under the terms of the GPL-3.0 License.
+from array import array
+from collections import OrderedDict
+from functools import lru_cache
+from threading import Lock
+from typing import Callable
+
+from PIL import ImageFont
+from pilmoji.helpers import NodeType, to_nodes
+
+from src.constants import *
+
+
+class GlyphTable:
+    """Advance widths of a font's glyphs and the kerning between pairs of
+    them, measured once at GLYPH_TABLE_SIZE, from which the width of a line
+    at any size is estimated by scaling rather than by laying it out.
+
+    Advances and kerning are precomputed for printable ASCII, held in flat
+    arrays indexed by code point, and measured on first use for any other
+    glyph or pair, of which the GLYPH_OTHER_MAX most recently used are kept.
+    """
+
+    def __init__(self, font_path: str) -> None:
+        self._font = ImageFont.truetype(font_path, GLYPH_TABLE_SIZE)
+        self._lock = Lock()
+
+        chars = range(GLYPH_TABLE_FIRST, GLYPH_TABLE_LAST + 1)
+        span = len(chars)
+
+        self._advances = array("f", (
+            self._font.getlength(chr(c)) for c in chars))
+        self._kerning = array("f", bytes(4 * span * span))
+
+        for i, a in enumerate(chars):
+            for j, b in enumerate(chars):
+                self._kerning[i * span + j] = (
+                    self._font.getlength(chr(a) + chr(b)) -
+                    self._advances[i] -
+                    self._advances[j]
+                )
+
+        self._span = span
+        self._advances_other: OrderedDict[str, float] = OrderedDict()
+        self._kerning_other: OrderedDict[str, float] = OrderedDict()
+
+    def text_length(self, text: str) -> float:
+        """Estimates the advance width of `text` at GLYPH_TABLE_SIZE."""
+        span = self._span
+        length = 0.0
+        char_prev = None
+        index_prev = -1
+
+        for char in text:
+            index = ord(char) - GLYPH_TABLE_FIRST
+            tabled = 0 <= index < span
+
+            if tabled:
+                length += self._advances[index]
+            else:
+                length += self._other_advance(char)
+
+            if char_prev is not None:
+                if tabled and 0 <= index_prev < span:
+                    length += self._kerning[index_prev * span + index]
+                else:
+                    length += self._other_kerning(char_prev + char)
+
+            char_prev = char
+            index_prev = index
+
+        return length
+
+    def line_rate(self, text: str, emoji_scale_factor: float) -> float:
+        """Estimates the width of a line per unit of font size, as Pilmoji
+        sizes it, with each emoji as wide as the font size scaled."""
+        rate = 0.0
+
+        for line in to_nodes(text):
+            for node in line:
+                if node.type is NodeType.text:
+                    rate += self.text_length(node.content) / GLYPH_TABLE_SIZE
+                else:
+                    rate += emoji_scale_factor
+
+        return rate
+
+    def _other_advance(self, char: str) -> float:
+        return self._other(
+            self._advances_other, char, lambda: self._font.getlength(char))
+
+    def _other_kerning(self, pair: str) -> float:
+        return self._other(self._kerning_other, pair, lambda: (
+            self._font.getlength(pair) -
+            self._font.getlength(pair[0]) -
+            self._font.getlength(pair[1])
+        ))
+
+    def _other(
+            self,
+            other: OrderedDict,
+            key: str,
+            measure: Callable[[], float]
+    ) -> float:
+        with self._lock:
+            if key in other:
+                other.move_to_end(key)
+                return other[key]
+
+            other[key] = measure()
+
+            if len(other) > GLYPH_OTHER_MAX:
+                other.popitem(last=False)
+
+            return other[key]
+
+
+@lru_cache(maxsize=None)
+def get_glyph_table(font_path: str) -> GlyphTable:
+    return GlyphTable(font_path)
+
+
+@lru_cache(maxsize=GLYPH_HEIGHT_CACHE_SIZE)
+def glyph_height(font: ImageFont.FreeTypeFont, char: str) -> int:
+    return font.getsize(char)[1]
+
+
+def text_height(font: ImageFont.FreeTypeFont, text: str) -> int:
+    """Returns the height of `text` as font.getsize gives it, from the
+    heights of its glyphs at this font's size, each measured once.
+
+    That height runs from the font's ascent to the bottom of the lowest
+    glyph, so it is the greatest height of any one glyph.
+    """
+    if len(text) == 0:
+        return font.getsize(text)[1]
+
+    return max(glyph_height(font, char) for char in text)
@@ -0,0 +1,137 @@
+# Copyright (c) 2021-2025 r3w0p
+# The following code can be redistributed and/or
+# modified under the terms of the GPL-3.0 License.
+from io import BytesIO
+from typing import Optional, Tuple
+
+from PIL import Image
+
+from src.constants import *
+from src.exceptions import MinorMemeoffError, UnsupportedMemeoffError
+
+
+def image_ftype_from_bytes(image_bytes: bytes) -> Optional[str]:
+    # Identify the real format by its magic number, whatever the URL says
+    if image_bytes.startswith(b"\xFF\xD8\xFF"):
+        return FILE_TYPE_JPEG
+
+    if image_bytes.startswith(b"\x89PNG\r\n\x1A\n"):
+        return FILE_TYPE_PNG
+
+    if image_bytes[:6] in [b"GIF87a", b"GIF89a"]:
+        return FILE_TYPE_GIF
+
+    if image_bytes[:4] == b"RIFF" and image_bytes[8:12] == b"WEBP":
+        return FILE_TYPE_WEBP
+
+    return None
+
+
+def image_size_from_bytes(image_bytes: bytes) -> Optional[Tuple[int, int]]:
+    # From the header alone, without decoding
+    image_ftype = image_ftype_from_bytes(image_bytes)
+
+    if image_ftype is None:
+        return None
+
+    return _image_size(image_bytes, image_ftype, "Image")
+
+
+def check_image_size(size: Tuple[int, int], name: str) -> None:
+    # Too many pixels to decode without risking memory (decompression bomb)
+    if size[0] * size[1] > IMAGE_MAX_PIXELS:
+        raise MinorMemeoffError(
+            f"{name} has more than {IMAGE_MAX_PIXELS} pixels.")
+
+
+class ImageHeader:
+    """Inspects an image as its bytes arrive, so that one whose file type
+    is not supported, or that has too many pixels, is rejected as soon as
+    its header says so rather than once it has all been downloaded."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.ftype: Optional[str] = None
+        self.size: Optional[Tuple[int, int]] = None
+        self._done = False
+
+    def feed(self, head: bytes) -> bool:
+        """Inspects `head`, the image's bytes so far, returning whether its
+        header is done with, or raising MinorMemeoffError if unusable.
+
+        Headers not read within IMAGE_HEADER_MAX_BYTES are given up on, and
+        the image is checked again when it is opened.
+        """
+        if self._done:
+            return True
+
+        if len(head) < IMAGE_HEADER_MAGIC_BYTES:
+            return False
+
+        if self.ftype is None:
+            self.ftype = image_ftype_from_bytes(head)
+
+            if self.ftype is None:
+                raise UnsupportedMemeoffError(
+                    f"{self.name} file type is not supported.")
+
+        self.size = _image_size(head, self.ftype, self.name)
+
+        if self.size is None:
+            self._done = len(head) >= IMAGE_HEADER_MAX_BYTES
+            return self._done
+
+        self._done = True
+        check_image_size(self.size, self.name)
+
+        return True
+
+    def close(self, data: bytes) -> None:
+        """Inspects the image's complete bytes, for one shorter than the
+        magic numbers that identify its file type."""
+        if self.ftype is None and image_ftype_from_bytes(data) is None:
+            raise UnsupportedMemeoffError(
+                f"{self.name} file type is not supported.")
+
+
+def _image_size(
+        head: bytes,
+        image_ftype: str,
+        name: str
+) -> Optional[Tuple[int, int]]:
+    # Pillow needs the whole of a WebP file before it reports its size
+    if image_ftype == FILE_TYPE_WEBP:
+        return _webp_size(head)
+
+    try:
+        return Image.open(BytesIO(head), formats=[image_ftype]).size
+
+    except Image.DecompressionBombError:
+        raise MinorMemeoffError(
+            f"{name} has more than {IMAGE_MAX_PIXELS} pixels.")
+
+    except Exception:
+        return None  # header not yet complete
+
+
+def _webp_size(head: bytes) -> Optional[Tuple[int, int]]:
+    # Canvas size from the first chunk, as laid out in the WebP container
+    chunk = head[12:16]
+
+    if chunk == b"VP8X" and len(head) >= 30:
+        return (
+            1 + int.from_bytes(head[24:27], "little"),
+            1 + int.from_bytes(head[27:30], "little")
+        )
+
+    if chunk == b"VP8L" and len(head) >= 25:
+        bits = int.from_bytes(head[21:25], "little")
+        return 1 + (bits & 0x3FFF), 1 + ((bits >> 14) & 0x3FFF)
+
+    if chunk == b"VP8 " and len(head) >= 30:
+        return (
+            int.from_bytes(head[26:28], "little") & 0x3FFF,
+            int.from_bytes(head[28:30], "little") & 0x3FFF
+        )
+
+    return None
@@ -0,0 +1,132 @@
+# Copyright (c) 2021-2025 r3w0p
+# The following code can be redistributed and/or
+# modified under the terms of the GPL-3.0 License.
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from src.constants import *
+from src.cost import CostModel
+from src.exceptions import MajorMemeoffError
+from src.render import RenderExecutor
+from src.scheduler import FairScheduler, SchedulerQuota
+
+
+class RenderLane(NamedTuple):
+    name: str
+    scheduler: FairScheduler
+    executor: RenderExecutor
+
+
+class RenderLanes:
+    """Routes each render to a fast or a slow lane by how long `model`
+    predicts it will take, so that cheap renders never queue behind
+    expensive ones.
+
+    Each lane has its own scheduler, though their schedulers may share a
+    SchedulerQuota, and its own render workers. Renders predicted to take
+    more than `slow_seconds` go to the `slow` lane, if there is one, and the
+    rest to the `fast` lane. Every render timed through `render_bytes`
+    calibrates the model.
+    """
+
+    def __init__(
+            self,
+            fast: RenderLane,
+            slow: Optional[RenderLane] = None,
+            slow_seconds: float = LANE_SLOW_SECONDS,
+            model: Optional[CostModel] = None
+    ) -> None:
+        if slow_seconds < 0:
+            raise MajorMemeoffError(
+                f"Slow lane seconds must not be negative: {slow_seconds}")
+
+        self.fast = fast
+        self.slow = slow
+        self.model = model if model is not None else CostModel()
+
+        self._slow_seconds = slow_seconds
+
+    @property
+    def lanes(self) -> List[RenderLane]:
+        return [self.fast] + ([self.slow] if self.slow is not None else [])
+
+    def route(self, features: Sequence[float]) -> RenderLane:
+        if (
+                self.slow is not None and
+                self.model.predict(features) > self._slow_seconds
+        ):
+            return self.slow
+
+        return self.fast
+
+    async def render_bytes(
+            self,
+            lane: RenderLane,
+            features: Sequence[float],
+            *args,
+            **kwargs
+    ) -> Tuple[bytes, str]:
+        """Renders as RenderExecutor.render_bytes in `lane`, observing how
+        long it took against its `features`."""
+        result, seconds = await lane.executor.render_bytes_timed(
+            *args, **kwargs)
+        self.model.observe(features, seconds)
+
+        return result
+
+    async def start(self) -> None:
+        for lane in self.lanes:
+            await lane.executor.start()
+
+    def shutdown(self, wait: bool = True) -> None:
+        for lane in self.lanes:
+            lane.executor.shutdown(wait=wait)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {lane.name: lane.scheduler.stats() for lane in self.lanes}
+
+
+def get_render_lanes(
+        args,
+        formats,
+        emoji_source,
+        guild_max_active: int,
+        user_max_pending: int
+) -> RenderLanes:
+    """Creates the render lanes configured by `args`: a fast lane with the
+    renders and workers of the program, and unless `slow_lane_seconds` is
+    0, a slow lane running `slow_lane_renders` at once.
+
+    In inline mode there is no slow lane, as every render runs on the event
+    loop and a slow one would hold up the fast lane all the same.
+
+    The lanes share one quota, so the queue, guild and user limits hold
+    across both lanes together rather than once per lane.
+    """
+    quota = SchedulerQuota(
+        max_queued=args.max_queued_renders,
+        guild_max_active=guild_max_active,
+        user_max_pending=user_max_pending
+    )
+
+    def lane(name: str, max_active: int, workers: int) -> RenderLane:
+        return RenderLane(
+            name=name,
+            scheduler=FairScheduler(max_active=max_active, quota=quota),
+            executor=RenderExecutor(
+                formats=formats,
+                emoji_source=emoji_source,
+                mode=args.render_mode,
+                workers=workers,
+                recycle=args.render_recycle,
+                prewarm=not args.disable_prewarm
+            )
+        )
+
+    fast = lane(LANE_FAST, args.max_active_renders, args.render_workers)
+    slow = None
+
+    if args.slow_lane_seconds > 0 and args.render_mode != RENDER_MODE_INLINE:
+        slow = lane(
+            LANE_SLOW, args.slow_lane_renders, args.slow_lane_renders)
+
+    return RenderLanes(fast, slow, args.slow_lane_seconds)
@@ -0,0 +1,198 @@
+# Copyright (c) 2021-2025 r3w0p
+# The following code can be redistributed and/or
+# modified under the terms of the GPL-3.0 License.
+from bisect import bisect_left
+from threading import Lock
+from typing import Callable, Dict, List, Tuple
+
+from aiohttp import web
+
+from src.constants import *
+
+# Label names and values, in order
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class MetricsRegistry:
+    """Counters, histograms and gauges rendered in the Prometheus text
+    exposition format.
+
+    Metrics are declared once with their help text and may then be updated
+    from any thread. Gauges are read from a callable when rendered.
+    """
+
+    def __init__(
+            self,
+            buckets: List[float] = METRICS_BUCKETS_SECONDS
+    ) -> None:
+        self._buckets = sorted(buckets)
+        self._lock = Lock()
+
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, List[float]]] = {}
+        self._gauges: Dict[str, Callable[[], Dict[Labels, float]]] = {}
+
+    def counter(self, name: str, help_text: str) -> None:
+        self._help[name] = ("counter", help_text)
+        self._counters.setdefault(name, {})
+
+    def histogram(self, name: str, help_text: str) -> None:
+        self._help[name] = ("histogram", help_text)
+        self._histograms.setdefault(name, {})
+
+    def gauge(
+            self,
+            name: str,
+            help_text: str,
+            read: Callable[[], Dict[Labels, float]]
+    ) -> None:
+        self._help[name] = ("gauge", help_text)
+        self._gauges[name] = read
+
+    def inc(self, name: str, amount: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+
+        with self._lock:
+            series = self._counters[name]
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+
+        with self._lock:
+            series = self._histograms[name]
+
+            # Per-bucket counts, made cumulative when rendered, then the
+            # sum and count of all observations
+            if key not in series:
+                series[key] = [0] * (len(self._buckets) + 3)
+
+            values = series[key]
+            values[bisect_left(self._buckets, value)] += 1
+            values[-2] += value
+            values[-1] += 1
+
+    def render(self) -> str:
+        lines = []
+
+        with self._lock:
+            for name, (kind, help_text) in sorted(self._help.items()):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+
+                if kind == "counter":
+                    for key, value in self._counters[name].items():
+                        lines.append(f"{name}{_labels(key)} {value}")
+
+                elif kind == "histogram":
+                    for key, values in self._histograms[name].items():
+                        lines.extend(
+                            self._render_histogram(name, key, values))
+
+                else:
+                    for key, value in self._gauges[name]().items():
+                        lines.append(f"{name}{_labels(key)} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    def _render_histogram(
+            self,
+            name: str,
+            key: Labels,
+            values: List[float]
+    ) -> List[str]:
+        lines = []
+        cumulative = 0
+
+        for bound, count in zip(self._buckets + ["+Inf"], values):
+            cumulative += count
+            labels = _labels(key + (("le", str(bound)),))
+            lines.append(f"{name}_bucket{labels} {cumulative}")
+
+        lines.append(f"{name}_sum{_labels(key)} {values[-2]}")
+        lines.append(f"{name}_count{_labels(key)} {values[-1]}")
+
+        return lines
+
+
+def _labels(key: Labels) -> str:
+    if len(key) == 0:
+        return ""
+
+    pairs = ",".join(
+        f'{name}="{_escape(value)}"' for name, value in key)
+
+    return f"{{{pairs}}}"
+
+
+def _escape(value: str) -> str:
+    value = value.replace("\\", "\\\\")
+    value = value.replace("\n", "\\n")
+
+    return value.replace('"', '\\"')
+
+
+def get_bot_metrics() -> MetricsRegistry:
+    """Creates a registry with the metrics recorded by the bot."""
+    metrics = MetricsRegistry()
+
+    metrics.histogram(
+        METRIC_STAGE_SECONDS, "Wall time of each pipeline stage.")
+    metrics.counter(
+        METRIC_RENDERS, "Formats applied, by format.")
+    metrics.counter(
+        METRIC_REQUESTS, "Meme requests handled, by outcome.")
+    metrics.counter(
+        METRIC_ERRORS, "Failed meme requests, by error type.")
+    metrics.counter(
+        METRIC_BYTES_IN, "Image bytes downloaded.")
+    metrics.counter(
+        METRIC_BYTES_OUT, "Image bytes sent.")
+
+    return metrics
+
+
+def record_stage_metrics(metrics: MetricsRegistry):
+    """Returns a stage recorder that observes stage timings in `metrics`,
+    counting each format applied as a render of that format."""
+    prefix = f"{STAGE_APPLY}_"
+
+    def recorder(name: str, elapsed: float) -> None:
+        metrics.observe(METRIC_STAGE_SECONDS, elapsed, stage=name)
+
+        if name.startswith(prefix):
+            metrics.inc(METRIC_RENDERS, format=name[len(prefix):])
+
+    return recorder
+
+
+async def start_metrics_server(
+        metrics: MetricsRegistry,
+        host: str,
+        port: int,
+        ready: Callable[[], bool] = lambda: True
+) -> web.AppRunner:
+    """Serves `metrics`, and a readiness check that succeeds once `ready`
+    returns True."""
+    async def handle(request):
+        return web.Response(
+            body=metrics.render().encode("utf-8"),
+            headers={"Content-Type": METRICS_CONTENT_TYPE}
+        )
+
+    async def handle_ready(request):
+        if not ready():
+            raise web.HTTPServiceUnavailable(text="not ready")
+
+        return web.Response(text="ready")
+
+    app = web.Application()
+    app.router.add_get(METRICS_PATH, handle)
+    app.router.add_get(READY_PATH, handle_ready)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+
+    return runner
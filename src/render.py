@@ -0,0 +1,322 @@
+# Copyright (c) 2021-2025 r3w0p
+# The following code can be redistributed and/or
+# modified under the terms of the GPL-3.0 License.
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, \
+    ThreadPoolExecutor
+from hashlib import sha256
+from threading import Lock
+from time import perf_counter
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+from src.animation import is_animated, process_animation
+from src.commands import normalise_content
+from src.constants import *
+from src.exceptions import MajorMemeoffError, MinorMemeoffError
+from src.formats import MemeFormat
+from src.functions import encode_image_to_budget, process_content, \
+    read_image, reshape_image
+from src.stages import clear_stage_recorders, collect_stages, record_stage
+from src.warmup import warm_fonts, warm_up
+
+# Per-process state for workers in process mode, set once by the initializer
+# so that formats and the emoji source are not pickled with every job
+_worker_formats: Optional[Dict[str, MemeFormat]] = None
+_worker_emoji_source = None
+
+
+def _init_worker(formats, emoji_source, prewarm: bool) -> None:
+    global _worker_formats, _worker_emoji_source
+
+    _worker_formats = formats
+    _worker_emoji_source = emoji_source
+
+    # Recorders copied from the parent would record into copies of its
+    # state, so stages are returned with each result instead
+    clear_stage_recorders()
+
+    if prewarm:
+        warm_up(formats, emoji_source)
+    else:
+        warm_fonts(formats)
+
+
+def _ping_worker() -> None:
+    pass
+
+
+def _render_bytes_in_worker(*args):
+    with collect_stages() as stages:
+        result = _timed(
+            render_bytes, *args, _worker_formats, _worker_emoji_source)
+
+    return result, stages
+
+
+def _timed(fn, *args):
+    # Times a job where it runs, so not counting any wait for a worker
+    time_start = perf_counter()
+    result = fn(*args)
+
+    return result, perf_counter() - time_start
+
+
+def render_bytes(
+        image_bytes: bytes,
+        image_url,
+        image_ftype: str,
+        content: str,
+        resample_down: str,
+        resample_up: str,
+        max_bytes: int,
+        formats,
+        emoji_source
+) -> Tuple[bytes, str]:
+    """Decodes, renders and encodes an image, or every frame of an
+    animation, from and to bytes.
+
+    Returns the encoded bytes and their file type, which may differ from
+    `image_ftype` if the output had to be re-encoded to fit `max_bytes`.
+    """
+    image = read_image(image_bytes, image_url)
+
+    if is_animated(image):
+        output = process_animation(
+            image=image,
+            content=content,
+            formats=formats,
+            emoji_source=emoji_source,
+            image_ftype=image_ftype,
+            resample_down=resample_down,
+            resample_up=resample_up
+        )
+
+        if 0 < max_bytes < len(output):
+            raise MinorMemeoffError(
+                f"Animation cannot be encoded in {max_bytes} bytes.")
+
+        return output, image_ftype
+
+    image = reshape_image(
+        image,
+        resample_down=resample_down,
+        resample_up=resample_up
+    )
+    image = process_content(
+        image=image,
+        content=content,
+        formats=formats,
+        emoji_source=emoji_source
+    )
+
+    return encode_image_to_budget(image, image_ftype, max_bytes)
+
+
+def render_cache_key(
+        image_bytes: bytes,
+        content: str,
+        emoji_style: str,
+        image_ftype: str,
+        *options: str
+) -> str:
+    """Identifies a rendered output by its source image bytes and by
+    everything else that affects how it is rendered and encoded."""
+    content = normalise_content(content)
+    digest = sha256()
+
+    for part in [
+        MEMEOFF_VERSION,
+        emoji_style,
+        str(COMMAND_DARK in content),
+        image_ftype,
+        *options,
+        content
+    ]:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+
+    digest.update(image_bytes)
+
+    return digest.hexdigest()
+
+
+def render_flight_key(image_url: str, content: str) -> str:
+    """Identifies a render that is in progress by its image URL and
+    normalised command."""
+    url = urlsplit(image_url)
+
+    # Discord signs attachment URLs per request, so two links to the same
+    # attachment may differ only in their query
+    if url.hostname in DISCORD_CDN_HOSTS:
+        url = url._replace(query="")
+
+    url = url._replace(fragment="")
+
+    return f"{urlunsplit(url)}\0{normalise_content(content)}"
+
+
+class RenderExecutor:
+    """Runs render_bytes off the event loop.
+
+    In "inline" mode, renders run on the calling thread. In "thread" and
+    "process" modes, renders are submitted to a pool of `workers`, which is
+    replaced with a fresh pool after every `recycle` jobs (0 disables this)
+    to cap memory growth in long-running workers. If `prewarm` is set, each
+    process worker of the first pool warms up before taking its first job.
+    Other workers only load fonts, as those of a replacement pool start on
+    a live request.
+    """
+
+    def __init__(
+            self,
+            formats: Dict[str, MemeFormat],
+            emoji_source,
+            mode: str = RENDER_MODE_INLINE,
+            workers: int = RENDER_WORKERS_DEFAULT,
+            recycle: int = RENDER_RECYCLE_DEFAULT,
+            prewarm: bool = False
+    ) -> None:
+        if mode not in RENDER_MODES_ALL:
+            raise MajorMemeoffError(f"Invalid render mode: {mode}")
+
+        if workers < 1:
+            raise MajorMemeoffError(
+                f"Render workers must be at least 1: {workers}")
+
+        if recycle < 0:
+            raise MajorMemeoffError(
+                f"Render recycle must not be negative: {recycle}")
+
+        self._formats = formats
+        self._emoji_source = emoji_source
+        self._mode = mode
+        self._workers = workers
+        self._recycle = recycle
+        self._prewarm = prewarm
+
+        self._pool: Optional[Executor] = None
+        self._pool_jobs: int = 0
+        self._lock = Lock()
+
+    @property
+    def mode(self) -> str:
+        return self._mode
+
+    async def render_bytes(
+            self,
+            image_bytes: bytes,
+            image_url,
+            image_ftype: str,
+            content: str,
+            resample_down: str = IMAGE_RESAMPLE_DOWN,
+            resample_up: str = IMAGE_RESAMPLE_UP,
+            max_bytes: int = ENCODE_MAX_BYTES
+    ) -> Tuple[bytes, str]:
+        result, _ = await self.render_bytes_timed(
+            image_bytes,
+            image_url,
+            image_ftype,
+            content,
+            resample_down=resample_down,
+            resample_up=resample_up,
+            max_bytes=max_bytes
+        )
+
+        return result
+
+    async def render_bytes_timed(
+            self,
+            image_bytes: bytes,
+            image_url,
+            image_ftype: str,
+            content: str,
+            resample_down: str = IMAGE_RESAMPLE_DOWN,
+            resample_up: str = IMAGE_RESAMPLE_UP,
+            max_bytes: int = ENCODE_MAX_BYTES
+    ) -> Tuple[Tuple[bytes, str], float]:
+        """As render_bytes, also returning how many seconds the render took
+        where it ran, not counting any wait for a free worker."""
+        args = (
+            image_bytes,
+            image_url,
+            image_ftype,
+            content,
+            resample_down,
+            resample_up,
+            max_bytes
+        )
+
+        if self._mode == RENDER_MODE_INLINE:
+            return _timed(
+                render_bytes, *args, self._formats, self._emoji_source)
+
+        return self._result(
+            await asyncio.wrap_future(self._submit_bytes(*args)))
+
+    async def start(self) -> None:
+        """Starts every process worker now, rather than on first use, and
+        waits until they are ready."""
+        if self._mode != RENDER_MODE_PROCESS:
+            return
+
+        # Jobs submitted while no worker is idle each start a new worker
+        await asyncio.gather(*[
+            asyncio.wrap_future(self._submit_job(_ping_worker))
+            for _ in range(self._workers)
+        ])
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait)
+                self._pool = None
+                self._pool_jobs = 0
+
+    def _result(self, result):
+        if self._mode != RENDER_MODE_PROCESS:
+            return result
+
+        # Report the stages timed in the worker as though timed here
+        result, stages = result
+
+        for name, elapsed in stages:
+            record_stage(name, elapsed)
+
+        return result
+
+    def _submit_bytes(self, *args):
+        if self._mode == RENDER_MODE_THREAD:
+            return self._submit_job(
+                _timed, render_bytes, *args, self._formats,
+                self._emoji_source)
+
+        return self._submit_job(_render_bytes_in_worker, *args)
+
+    def _submit_job(self, fn, *args, **kwargs):
+        with self._lock:
+            if self._pool is None:
+                self._pool = self._new_pool(self._prewarm)
+
+            elif 0 < self._recycle <= self._pool_jobs:
+                # In-flight jobs still finish on the old pool
+                self._pool.shutdown(wait=False)
+                self._pool = self._new_pool(False)
+                self._pool_jobs = 0
+
+            self._pool_jobs += 1
+
+            return self._pool.submit(fn, *args, **kwargs)
+
+    def _new_pool(self, prewarm: bool) -> Executor:
+        if self._mode == RENDER_MODE_THREAD:
+            return ThreadPoolExecutor(
+                max_workers=self._workers,
+                thread_name_prefix=NAME_MEMEOFF
+            )
+
+        return ProcessPoolExecutor(
+            max_workers=self._workers,
+            initializer=_init_worker,
+            initargs=(self._formats, self._emoji_source, prewarm)
+        )
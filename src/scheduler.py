@@ -0,0 +1,252 @@
+# Copyright (c) 2021-2025 r3w0p
+# The following code can be redistributed and/or
+# modified under the terms of the GPL-3.0 License.
+import asyncio
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from typing import Dict, Hashable, List, Optional
+
+from src.constants import *
+from src.exceptions import BusyMemeoffError, MajorMemeoffError
+
+
+class SchedulerQuota:
+    """Limits on waiting renders, on each guild's running renders and on
+    each user's pending renders, counted across every FairScheduler that
+    shares this quota rather than by each one separately."""
+
+    def __init__(
+            self,
+            max_queued: int = SCHEDULER_MAX_QUEUED,
+            guild_max_active: int = SCHEDULER_GUILD_MAX_ACTIVE,
+            user_max_pending: int = SCHEDULER_USER_MAX_PENDING
+    ) -> None:
+        if guild_max_active < 1 or user_max_pending < 1:
+            raise MajorMemeoffError(
+                "Scheduler concurrency limits must be at least 1.")
+
+        if max_queued < 0:
+            raise MajorMemeoffError(
+                f"Scheduler queue limit must not be negative: {max_queued}")
+
+        self.max_queued = max_queued
+        self.guild_max_active = guild_max_active
+        self.user_max_pending = user_max_pending
+
+        self.queued: int = 0
+        self.guild_active: Counter = Counter()
+        self.user_pending: Counter = Counter()
+        self.schedulers: List["FairScheduler"] = []
+
+    def dispatch(self) -> None:
+        # A guild's render finishing in one scheduler may free a turn in any
+        for scheduler in self.schedulers:
+            scheduler._dispatch()
+
+
+class FairScheduler:
+    """Admits renders fairly across guilds.
+
+    At most `max_active` renders run at once and at most `max_queued` wait
+    for a turn, beyond which requests are rejected straight away. Each guild
+    may run at most `guild_max_active` renders at once and each user may have
+    at most `user_max_pending` running or waiting.
+
+    If `quota` is given, its limits are used instead and are shared with
+    the other schedulers given it; only `max_active` is this scheduler's own.
+
+    Waiting guilds are served by stride scheduling: each turn goes to the
+    guild that has had the least service relative to its weight in
+    `weights` (default 1), so one busy guild cannot starve the rest.
+    """
+
+    def __init__(
+            self,
+            max_active: int = SCHEDULER_MAX_ACTIVE,
+            max_queued: int = SCHEDULER_MAX_QUEUED,
+            guild_max_active: int = SCHEDULER_GUILD_MAX_ACTIVE,
+            user_max_pending: int = SCHEDULER_USER_MAX_PENDING,
+            weights: Optional[Dict[Hashable, float]] = None,
+            quota: Optional[SchedulerQuota] = None
+    ) -> None:
+        if max_active < 1:
+            raise MajorMemeoffError(
+                "Scheduler concurrency limits must be at least 1.")
+
+        if quota is None:
+            quota = SchedulerQuota(
+                max_queued, guild_max_active, user_max_pending)
+
+        self._max_active = max_active
+        self._quota = quota
+        self._weights = weights if weights is not None else {}
+
+        self._queues: Dict[Hashable, deque] = {}
+        self._queued: int = 0
+        self._active: int = 0
+
+        quota.schedulers.append(self)
+
+        # Stride scheduling: service received by each waiting guild, scaled
+        # by its weight, and the service level of the last guild served
+        self._guild_pass: Dict[Hashable, float] = {}
+        self._pass: float = 0.0
+
+        self.admitted: int = 0
+        self.rejected: int = 0
+
+    @asynccontextmanager
+    async def slot(self, guild_id: Hashable, user_id: Hashable):
+        """Waits for a turn to render, or raises BusyMemeoffError if the
+        user or the scheduler already has too much waiting."""
+        await self._acquire(guild_id, user_id)
+
+        try:
+            yield
+        finally:
+            self._release(guild_id, user_id)
+
+    @asynccontextmanager
+    async def pending(self, user_id: Hashable):
+        """Counts a request that waits on a render admitted for another
+        towards its user's pending renders, taking no turn to render, or
+        raises BusyMemeoffError if the user already has too many."""
+        quota = self._quota
+
+        if quota.user_pending[user_id] >= quota.user_max_pending:
+            self.rejected += 1
+            raise BusyMemeoffError(
+                "Please wait for your other memes to finish.")
+
+        quota.user_pending[user_id] += 1
+
+        try:
+            yield
+        finally:
+            quota.user_pending[user_id] -= 1
+
+            if quota.user_pending[user_id] <= 0:
+                del quota.user_pending[user_id]
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "active": self._active,
+            "queued": self._queued,
+            "queued_by_guild": {
+                guild_id: len(queue)
+                for guild_id, queue in self._queues.items()
+            },
+            "admitted": self.admitted,
+            "rejected": self.rejected
+        }
+
+    async def _acquire(self, guild_id: Hashable, user_id: Hashable) -> None:
+        quota = self._quota
+
+        if quota.user_pending[user_id] >= quota.user_max_pending:
+            self.rejected += 1
+            raise BusyMemeoffError(
+                "Please wait for your other memes to finish.")
+
+        if quota.queued >= quota.max_queued and not self._can_start(guild_id):
+            self.rejected += 1
+            raise BusyMemeoffError("Too busy right now, try again soon.")
+
+        waiter = asyncio.get_running_loop().create_future()
+
+        if guild_id not in self._queues:
+            # Guilds start level with the last one served, banking nothing
+            # for the time they had nothing waiting
+            self._queues[guild_id] = deque()
+            self._guild_pass[guild_id] = self._pass
+
+        self._queues[guild_id].append(waiter)
+        self._queued += 1
+        quota.queued += 1
+        quota.user_pending[user_id] += 1
+        self._dispatch()
+
+        try:
+            await waiter
+
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release(guild_id, user_id)  # given a turn, then dropped
+            else:
+                self._dequeue(guild_id, waiter)
+                quota.user_pending[user_id] -= 1
+
+                if quota.user_pending[user_id] <= 0:
+                    del quota.user_pending[user_id]
+
+                quota.dispatch()
+
+            raise
+
+        self.admitted += 1
+
+    def _release(self, guild_id: Hashable, user_id: Hashable) -> None:
+        quota = self._quota
+
+        self._active -= 1
+        quota.guild_active[guild_id] -= 1
+        quota.user_pending[user_id] -= 1
+
+        if quota.guild_active[guild_id] <= 0:
+            del quota.guild_active[guild_id]
+
+        if quota.user_pending[user_id] <= 0:
+            del quota.user_pending[user_id]
+
+        quota.dispatch()
+
+    def _can_start(self, guild_id: Hashable) -> bool:
+        quota = self._quota
+
+        return (
+            self._active < self._max_active and
+            quota.guild_active[guild_id] < quota.guild_max_active and
+            guild_id not in self._queues
+        )
+
+    def _dispatch(self) -> None:
+        quota = self._quota
+
+        while self._active < self._max_active:
+            eligible = [
+                guild_id for guild_id in self._queues
+                if quota.guild_active[guild_id] < quota.guild_max_active
+            ]
+
+            if len(eligible) == 0:
+                return
+
+            guild_id = min(eligible, key=self._guild_pass.__getitem__)
+            waiter = self._queues[guild_id].popleft()
+            self._queued -= 1
+            quota.queued -= 1
+
+            self._pass = self._guild_pass[guild_id]
+            self._guild_pass[guild_id] += 1 / self._weights.get(guild_id, 1)
+
+            if len(self._queues[guild_id]) == 0:
+                del self._queues[guild_id]
+                del self._guild_pass[guild_id]
+
+            self._active += 1
+            quota.guild_active[guild_id] += 1
+            waiter.set_result(None)
+
+    def _dequeue(self, guild_id: Hashable, waiter) -> None:
+        queue = self._queues.get(guild_id)
+
+        if queue is None or waiter not in queue:
+            return
+
+        queue.remove(waiter)
+        self._queued -= 1
+        self._quota.queued -= 1
+
+        if len(queue) == 0:
+            del self._queues[guild_id]
+            del self._guild_pass[guild_id]
@@ -0,0 +1,131 @@
+# Copyright (c) 2021-2025 r3w0p
+# The following code can be redistributed and/or
+# modified under the terms of the GPL-3.0 License.
+import asyncio
+
+from aiohttp import web
+
+from src.exceptions import BusyMemeoffError, UnsupportedMemeoffError
+from src.cost import render_features
+from src.functions import *
+from src.lanes import get_render_lanes
+from src.warmup import print_warm_up, warm_glyph_tables, warm_up
+
+
+def get_service(args) -> web.Application:
+    """Creates an HTTP service that renders memes without Discord.
+
+    POST an image as the request body to /render with the command in the
+    `command` query parameter, and the rendered image is returned. Clients
+    are scheduled fairly by address, as the bot schedules guilds, and renders
+    predicted to be expensive run in a lane of their own. The service warms
+    up before it starts listening.
+    """
+    formats: Dict[str, MemeFormat] = get_formats()
+    emoji_source = get_emoji_source(
+        args.emoji, cache=not args.disable_emoji_cache)
+    render_lanes = get_render_lanes(
+        args,
+        formats,
+        emoji_source,
+        guild_max_active=args.client_max_active_renders,
+        user_max_pending=args.client_max_pending_renders
+    )
+
+    async def render(request: web.Request) -> web.Response:
+        # Reject bad commands and oversized bodies before reading anything
+        try:
+            parse_content(request.query.get("command", ""))
+        except MinorMemeoffError as e:
+            raise web.HTTPBadRequest(text=str(e))
+
+        if (
+                request.content_length is not None and
+                request.content_length > args.max_request_bytes
+        ):
+            raise web.HTTPRequestEntityTooLarge(
+                max_size=args.max_request_bytes,
+                actual_size=request.content_length)
+
+        # Unsupported or oversized images are rejected from their header
+        try:
+            image_bytes = await read_stream(
+                request.content,
+                args.max_request_bytes,
+                "Request body",
+                inspect=True
+            )
+        except UnsupportedMemeoffError as e:
+            raise web.HTTPUnsupportedMediaType(text=str(e))
+        except MinorMemeoffError as e:
+            raise web.HTTPRequestEntityTooLarge(
+                max_size=args.max_request_bytes,
+                actual_size=args.max_request_bytes + 1,
+                text=str(e))
+
+        image_ftype = image_ftype_from_bytes(image_bytes)
+
+        if image_ftype not in SUPPORTED_FILE_TYPES:
+            raise web.HTTPUnsupportedMediaType(
+                text="Image file type is not supported.")
+
+        features = render_features(
+            image_size_from_bytes(image_bytes),
+            parse_content(request.query["command"])
+        )
+        lane = render_lanes.route(features)
+
+        try:
+            async with lane.scheduler.slot(request.remote, request.remote):
+                output, image_ftype = await render_lanes.render_bytes(
+                    lane,
+                    features,
+                    image_bytes,
+                    "request body",
+                    image_ftype,
+                    request.query["command"],
+                    resample_down=args.resample_down,
+                    resample_up=args.resample_up,
+                    max_bytes=args.max_upload_bytes
+                )
+
+        except BusyMemeoffError as e:
+            raise web.HTTPServiceUnavailable(text=str(e))
+
+        except MinorMemeoffError as e:
+            raise web.HTTPUnprocessableEntity(text=str(e))
+
+        return web.Response(
+            body=output,
+            content_type=f"image/{image_ftype.lower()}"
+        )
+
+    # Set once warmed up
+    ready = asyncio.Event()
+
+    async def health(request: web.Request) -> web.Response:
+        return web.json_response(
+            {"ready": ready.is_set(), **render_lanes.stats()},
+            status=200 if ready.is_set() else 503
+        )
+
+    async def startup(app: web.Application) -> None:
+        if not args.disable_prewarm:
+            print_warm_up(await asyncio.to_thread(
+                warm_up, formats, emoji_source, args.prewarm_emoji))
+            await render_lanes.start()
+        else:
+            await asyncio.to_thread(warm_glyph_tables, formats)
+
+        ready.set()
+
+    async def cleanup(app: web.Application) -> None:
+        render_lanes.shutdown(wait=False)
+
+    app = web.Application(client_max_size=args.max_request_bytes)
+    app.router.add_post(SERVICE_PATH_RENDER, render)
+    app.router.add_get(SERVICE_PATH_HEALTH, health)
+    app.on_startup.append(startup)
+    app.on_cleanup.append(cleanup)
+
+    return app
@@ -0,0 +1,56 @@
+# Copyright (c) 2021-2025 r3w0p
+# The following code can be redistributed and/or
+# modified under the terms of the GPL-3.0 License.
+import asyncio
+from collections import Counter
+from time import monotonic
+from typing import Dict, Tuple
+
+import discord
+
+
+class ShardMonitor:
+    """Tracks the gateway latency and event rate of each shard a client
+    runs, or of shard 0 for a client that is not sharded."""
+
+    def __init__(self, client: discord.Client) -> None:
+        self._client = client
+        self._events: Counter = Counter()
+        self._events_since: float = monotonic()
+
+    def event(self, shard_id) -> None:
+        self._events[shard_id if shard_id is not None else 0] += 1
+
+    def latencies(self) -> Dict[int, float]:
+        if isinstance(self._client, discord.AutoShardedClient):
+            return dict(self._client.latencies)
+
+        return {0: self._client.latency}
+
+    def snapshot(self) -> Dict[int, Tuple[float, float]]:
+        """Returns the latency in seconds and the events per second since
+        the last snapshot of each shard."""
+        now = monotonic()
+        elapsed = max(now - self._events_since, 1e-9)
+        events, self._events = self._events, Counter()
+        self._events_since = now
+
+        latencies = self.latencies()
+
+        return {
+            shard_id: (
+                latencies.get(shard_id, float("nan")),
+                events[shard_id] / elapsed
+            )
+            for shard_id in sorted(latencies.keys() | events.keys())
+        }
+
+    async def report(self, interval: float) -> None:
+        # Prints a line per shard every `interval` seconds until cancelled
+        while True:
+            await asyncio.sleep(interval)
+
+            for shard_id, (latency, rate) in self.snapshot().items():
+                print(
+                    f"Shard {shard_id}: latency {latency * 1000:.0f}ms, "
+                    f"{rate:.2f} events/s")
@@ -0,0 +1,49 @@
+# Copyright (c) 2021-2025 r3w0p
+# The following code can be redistributed and/or
+# modified under the terms of the GPL-3.0 License.
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key.
+
+    The first caller for a key starts `fn`, and callers with the same key
+    that arrive before it finishes wait on that same call and share its
+    result or exception. The call runs in its own task, so cancelling one
+    caller does not cancel it for the others.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+        self.calls: int = 0
+        self.coalesced: int = 0
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable]):
+        call = self._calls.get(key)
+
+        if call is None:
+            self.calls += 1
+            call = asyncio.ensure_future(self._run(key, fn))
+            self._calls[key] = call
+        else:
+            self.coalesced += 1
+
+        return await asyncio.shield(call)
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._calls),
+            "calls": self.calls,
+            "coalesced": self.coalesced
+        }
+
+    async def _run(self, key: Hashable, fn: Callable[[], Awaitable]):
+        try:
+            return await fn()
+        finally:
+            del self._calls[key]
@@ -0,0 +1,59 @@
+# Copyright (c) 2021-2025 r3w0p
+# The following code can be redistributed and/or
+# modified under the terms of the GPL-3.0 License.
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Callable, List, Tuple
+
+# Callables that receive the name and wall time in seconds of each stage
+_recorders: List[Callable[[str, float], None]] = []
+
+
+def add_stage_recorder(recorder: Callable[[str, float], None]) -> None:
+    _recorders.append(recorder)
+
+
+def remove_stage_recorder(recorder: Callable[[str, float], None]) -> None:
+    _recorders.remove(recorder)
+
+
+@contextmanager
+def stage(name: str):
+    """Times the enclosed block as the named pipeline stage, reporting it
+    to every registered recorder. Does nothing if none are registered."""
+    if len(_recorders) == 0:
+        yield
+        return
+
+    time_start = perf_counter()
+
+    try:
+        yield
+    finally:
+        record_stage(name, perf_counter() - time_start)
+
+
+def record_stage(name: str, elapsed: float) -> None:
+    for recorder in _recorders:
+        recorder(name, elapsed)
+
+
+def clear_stage_recorders() -> None:
+    _recorders.clear()
+
+
+@contextmanager
+def collect_stages():
+    """Collects the stages timed in the enclosed block as a list of names
+    and wall times, so that they can be reported from another process."""
+    stages: List[Tuple[str, float]] = []
+
+    def recorder(name: str, elapsed: float) -> None:
+        stages.append((name, elapsed))
+
+    add_stage_recorder(recorder)
+
+    try:
+        yield stages
+    finally:
+        remove_stage_recorder(recorder)
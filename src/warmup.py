@@ -0,0 +1,89 @@
+# Copyright (c) 2021-2025 r3w0p
+# The following code can be redistributed and/or
+# modified under the terms of the GPL-3.0 License.
+from time import perf_counter
+from typing import Callable, Dict
+
+from PIL import Image
+from pilmoji.source import BaseSource
+
+from src.functions import *
+
+
+def warm_up(
+        formats: Dict[str, MemeFormat],
+        emoji_source,
+        warm_emoji: bool = False
+) -> Dict[str, float]:
+    """Does ahead of time what the first renders would otherwise pay for,
+    returning how many seconds each step took.
+
+    Pillow's plugins are imported, every format's fonts are loaded with
+    their glyph tables and at a spread of sizes font fitting may try, and
+    each format renders a sample image.
+    If `warm_emoji` is set and `emoji_source` is a cache, common emoji are
+    fetched into it and used in the samples.
+    """
+    timings: Dict[str, float] = {}
+
+    def step(name: str, fn: Callable[[], object]) -> None:
+        time_start = perf_counter()
+        fn()
+        timings[name] = perf_counter() - time_start
+
+    step(PREWARM_STEP_PLUGINS, Image.init)
+    step(PREWARM_STEP_FONTS, lambda: warm_fonts(formats))
+
+    text = PREWARM_TEXT
+
+    # An uncached source is a class, with nothing to keep what is fetched
+    if warm_emoji and isinstance(emoji_source, BaseSource):
+        step(PREWARM_STEP_EMOJI, lambda: [
+            emoji_source.get_emoji(emoji) for emoji in PREWARM_EMOJI])
+        text = f"{text} {' '.join(PREWARM_EMOJI)}"
+
+    image_bytes = encode_image(
+        Image.effect_mandelbrot(
+            PREWARM_IMAGE_SIZE, (-2.0, -1.2, 1.0, 1.2), 20).convert("RGB"),
+        FILE_TYPE_JPEG
+    )
+
+    for command in COMMANDS_FORMATS:
+        step(f"{PREWARM_STEP_RENDER}_{command[1:]}", lambda: encode_image(
+            process_content(
+                image=open_image(image_bytes, PREWARM_STEP_RENDER),
+                content=f"{command} {text} {DELIM_CONTEXT} {text}",
+                formats=formats,
+                emoji_source=emoji_source
+            ),
+            FILE_TYPE_JPEG
+        ))
+
+    return timings
+
+
+def warm_glyph_tables(formats: Dict[str, MemeFormat]) -> None:
+    """Builds the glyph table of every format's fonts, which fitting text
+    to any image needs, so that the first render does not pay for it."""
+    for meme_format in formats.values():
+        for path, _ in meme_format.fonts():
+            get_glyph_table(path)
+
+
+def warm_fonts(formats: Dict[str, MemeFormat]) -> None:
+    """Builds the glyph tables of every format's fonts and loads them at a
+    spread of sizes font fitting may try, without rendering anything."""
+    warm_glyph_tables(formats)
+
+    for meme_format in formats.values():
+        for path, init_font_size in meme_format.fonts():
+            for size in fit_font_sizes(
+                    init_font_size, PREWARM_FONT_SEARCH_DEPTH):
+                get_font(path, size)
+
+
+def print_warm_up(timings: Dict[str, float]) -> None:
+    for name, elapsed in timings.items():
+        print(f"Prewarm {name}: {elapsed * 1000:.0f}ms")
+
+    print(f"Prewarm total: {sum(timings.values()) * 1000:.0f}ms")
@@ -0,0 +1,191 @@
+# Copyright (c) 2021-2025 r3w0p
+# The following code can be redistributed and/or
+# modified under the terms of the GPL-3.0 License.
+import argparse
+import json
+import platform
+import resource
+from collections import defaultdict
+from multiprocessing import get_context
+from time import perf_counter
+
+import PIL
+import pilmoji
+
+from src.functions import *
+from src.stages import add_stage_recorder
+
+PATH_TEST: Path = Path(__file__).parent.absolute()
+
+STAGE_TOTAL: str = "total"
+PERCENTILES: List[int] = [50, 95, 99]
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-i", "--image", help="Input image (default: generated).", type=str)
+parser.add_argument("-b", "--batch", help="Command batches.", type=str, nargs="+", required=True)
+parser.add_argument("-s", "--sizes", help="Input widths in pixels.", type=int, nargs="+", default=[250, 500, 1000, 2000, 4000])
+parser.add_argument("-f", "--ftype", help="File type the input is encoded as.", type=str, default=FILE_TYPE_JPEG)
+parser.add_argument("-r", "--repeat", help="Runs of each command per input.", type=int, default=5)
+parser.add_argument("-j", "--json", help="Write results to this JSON file.", type=str)
+parser.add_argument("-c", "--compare", help="Compare with a previous JSON file.", type=str)
+parser.add_argument("-e", "--emoji", type=str, default=EMOJI_STYLE_APPLE,
+                    help=f"Emoji style to use ({', '.join(EMOJI_STYLES_ALL)}).")
+
+
+def percentile(values: List[float], p: int) -> float:
+    # Nearest-rank percentile
+    values = sorted(values)
+    rank = max(1, -(-len(values) * p // 100))
+
+    return values[rank - 1]
+
+
+def make_input(path_image: Optional[Path], width: int, ftype: str) -> bytes:
+    if path_image is not None:
+        image = Image.open(path_image).convert("RGB")
+    else:
+        image = Image.effect_mandelbrot(
+            (1600, 1200), (-2.0, -1.2, 1.0, 1.2), 100).convert("RGB")
+
+    height = max(1, round(image.size[1] * width / image.size[0]))
+    image = image.resize((width, height))
+
+    return encode_image(image, ftype)
+
+
+def run_case(case: dict) -> dict:
+    # Runs in a fresh process so that peak memory belongs to this case
+    rss_start = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    formats = get_formats()
+    emoji_source = emoji_style_to_pilmoji_source_class(case["emoji"])
+    image_bytes = make_input(case["image"], case["width"], case["ftype"])
+
+    timings: Dict[str, List[float]] = defaultdict(list)
+    add_stage_recorder(lambda name, elapsed: timings[name].append(elapsed))
+
+    for _ in range(case["repeat"]):
+        for content in case["commands"]:
+            time_start = perf_counter()
+
+            image = open_image(image_bytes, case["image"])
+            image = process_content(
+                image=image,
+                content=content,
+                formats=formats,
+                emoji_source=emoji_source
+            )
+            encode_image(image, case["ftype"])
+
+            timings[STAGE_TOTAL].append(perf_counter() - time_start)
+
+    rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    fits = fit_font_stats()
+
+    return {
+        "batch": case["batch"],
+        "width": case["width"],
+        "input_bytes": len(image_bytes),
+        "peak_rss_kb": rss_peak,
+        "peak_rss_delta_kb": rss_peak - rss_start,
+        "font_fits": fits["fits"],
+        "font_fit_measurements": fits["measurements"],
+        "stages": {
+            name: {
+                "count": len(values),
+                "mean_ms": 1000 * sum(values) / len(values),
+                **{
+                    f"p{p}_ms": 1000 * percentile(values, p)
+                    for p in PERCENTILES
+                }
+            }
+            for name, values in sorted(timings.items())
+        }
+    }
+
+
+def print_result(result: dict, previous: Optional[dict]) -> None:
+    print(
+        f"\n{result['batch']} @ {result['width']}px "
+        f"({result['input_bytes']} bytes in, "
+        f"peak RSS {result['peak_rss_kb']} KB)")
+
+    if result["font_fits"] > 0:
+        print(
+            f"  {result['font_fits']} font fits, "
+            f"{result['font_fit_measurements'] / result['font_fits']:.1f} "
+            f"measurements each")
+
+    for name, s in result["stages"].items():
+        line = (
+            f"  {name:<16} n={s['count']:<5} "
+            f"p50={s['p50_ms']:8.2f}ms "
+            f"p95={s['p95_ms']:8.2f}ms "
+            f"p99={s['p99_ms']:8.2f}ms"
+        )
+
+        if previous is not None and name in previous["stages"]:
+            p50_before = previous["stages"][name]["p50_ms"]
+
+            if p50_before > 0:
+                line += f"  ({s['p50_ms'] / p50_before:5.2f}x p50)"
+
+        print(line)
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    path_image = PATH_TEST / args.image if args.image is not None else None
+    ftype = args.ftype.upper()
+
+    if ftype == FILE_TYPE_JPG:
+        ftype = FILE_TYPE_JPEG
+
+    cases = []
+
+    for batch in args.batch:
+        path_batch: Path = PATH_TEST / batch
+
+        for width in args.sizes:
+            cases.append({
+                "batch": path_batch.stem,
+                "commands": open(path_batch).read().splitlines(),
+                "image": path_image,
+                "width": width,
+                "ftype": ftype,
+                "repeat": args.repeat,
+                "emoji": args.emoji
+            })
+
+    previous_by_case = {}
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            previous_by_case = {
+                (r["batch"], r["width"]): r for r in json.load(f)["cases"]
+            }
+
+    # One fresh worker per case keeps peak memory figures independent
+    with get_context("spawn").Pool(processes=1, maxtasksperchild=1) as pool:
+        results = []
+
+        for result in pool.imap(run_case, cases):
+            print_result(
+                result,
+                previous_by_case.get((result["batch"], result["width"])))
+            results.append(result)
+
+    if args.json is not None:
+        with open(args.json, "w") as f:
+            json.dump({
+                "meta": {
+                    "memeoff": MEMEOFF_VERSION,
+                    "pillow": PIL.__version__,
+                    "pilmoji": pilmoji.__version__,
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "ftype": ftype,
+                    "repeat": args.repeat
+                },
+                "cases": results
+            }, f, indent=2)
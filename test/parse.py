@@ -0,0 +1,85 @@
+# Copyright (c) 2021-2025 r3w0p
+# The following code can be redistributed and/or
+# modified under the terms of the GPL-3.0 License.
+import argparse
+import random
+from re import split as re_split
+from typing import List, Tuple
+
+from src.commands import contains_memeoff_format, normalise_content, \
+    parse_content
+from src.constants import *
+from src.exceptions import MinorMemeoffError
+
+# Pieces that random messages are made of: every command, text, delimiters,
+# variant selectors and near misses of commands
+ATOMS: List[str] = COMMANDS_ALL + [
+    "hi", " ", "there", DELIM_CONTEXT, DELIM_NEWLINE, DELIM_SPOILER, "/",
+    "‍", "️", "\U0001F600", "x/impact", " /impactful "
+]
+
+parser = argparse.ArgumentParser()
+parser.add_argument("-m", "--messages", help="Random messages to check.", type=int, default=100000)
+parser.add_argument("-l", "--length", help="Most pieces per message.", type=int, default=8)
+parser.add_argument("-s", "--seed", help="Random seed.", type=int, default=1)
+
+
+def parse_content_split(content: str) -> List[Tuple[str, str]]:
+    # The parser that process_content used before parse_content replaced it
+    content_split: List[str] = [
+        x.strip() for x in re_split(
+            REGEX_PATTERN_SLASH, normalise_content(content))
+        if x is not None and len(x.strip()) > 0
+    ]
+    formats = []
+
+    if len(content_split) == 0:
+        return formats
+
+    i: int = 0
+    # if first split is not a slash string, skip it
+    if content_split[i] not in COMMANDS_ALL:
+        i += 1
+
+    while i < len(content_split):
+        slash: str = content_split[i]
+        text: str = (
+            content_split[i + 1] if (
+                    i + 1 < len(content_split) and
+                    content_split[i + 1] not in COMMANDS_ALL
+            ) else ""
+        )
+
+        i += 1 if len(text) == 0 else 2
+
+        if slash in COMMANDS_FORMATS:
+            formats.append((slash, text))
+
+    return formats
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    mismatches = 0
+
+    for _ in range(args.messages):
+        content = "".join(
+            rng.choice(ATOMS) for _ in range(rng.randint(0, args.length)))
+
+        try:
+            formats = [tuple(f) for f in parse_content(content).formats]
+        except MinorMemeoffError:
+            formats = []
+
+        expected = parse_content_split(content)
+        detected = any(c in content for c in COMMANDS_FORMATS)
+
+        if (
+                formats != expected or
+                contains_memeoff_format(content) != detected
+        ):
+            mismatches += 1
+            print(f"Mismatch: {content!r}: {formats} != {expected}")
+
+    print(f"{mismatches} of {args.messages} messages parsed differently")